@@ -0,0 +1,116 @@
+"""Benchmark time and peak RSS of workbook diffs on a large model.
+
+Generates two versions of a DCF-shaped workbook with openpyxl's write-only
+mode; the second one changes a handful of inputs and formulas. Each mode
+runs in a child process so it reports its own peak RSS:
+
+* ``baseline`` - imports only
+* ``files`` - ``diff_files`` between the two versions
+* ``snapshot`` - ``snapshot_file`` of the old version
+* ``snapshot-diff`` - ``diff_snapshot`` of the new version against it
+
+Run with ``python -m benchmarks.bench_diff --rows 100000 --cols 10``
+(1M cells).
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["baseline", "files", "snapshot", "snapshot-diff"]
+
+
+def generate_workbook(path: str, rows: int, cols: int, edits: int = 0) -> None:
+    """Write ``rows`` label rows of ``cols`` data columns, ``edits`` of them changed."""
+    from openpyxl import Workbook
+    from openpyxl.utils.cell import get_column_letter
+
+    edited = {rows * (i + 1) // (edits + 1) for i in range(edits)}
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DCF")
+    ws.append(["Line item"] + [f"FY{2020 + c}" for c in range(cols - 1)])
+    for r in range(2, rows + 2):
+        values = []
+        for c in range(cols - 1):
+            if c % 3 == 2:
+                values.append(f"=A{r + 1}*{get_column_letter(c + 1)}{r}" if r in edited else f"={get_column_letter(c + 1)}{r}*1.05")
+            else:
+                values.append(r * 10 + c + (1 if r in edited else 0))
+        ws.append([f"Line {r}"] + values)
+    wb.save(path)
+
+
+def _snapshot(path: str):
+    from excel_mcp import diff
+
+    blocks, labels = diff.snapshot_file(path)
+    return {sheet: {b: (d, e) for b, d, e in rows} for sheet, rows in blocks.items()}, labels
+
+
+def _run_mode(mode: str, old_path: str, new_path: str) -> dict:
+    """Execute one benchmark mode in the current process."""
+    from excel_mcp import diff
+
+    detail = 0
+    if mode == "snapshot-diff":
+        blocks, labels = _snapshot(old_path)
+    start = time.perf_counter()
+    if mode == "files":
+        report = diff.diff_files(old_path, new_path)
+        detail = sum(report["counts"].values())
+    elif mode == "snapshot":
+        blocks, _ = diff.snapshot_file(old_path)
+        detail = sum(len(b) for b in blocks.values())
+    elif mode == "snapshot-diff":
+        report = diff.diff_snapshot(blocks, labels, new_path)
+        detail = sum(report["counts"].values())
+    return {
+        "mode": mode,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "result_size": detail,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=20)
+    parser.add_argument("--modes", nargs="*", default=MODES, choices=MODES)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "OLD", "NEW"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_mode(*args.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "model_v1.xlsx")
+        new_path = os.path.join(tmp, "model_v2.xlsx")
+        start = time.perf_counter()
+        generate_workbook(old_path, args.rows, args.cols)
+        generate_workbook(new_path, args.rows, args.cols, args.edits)
+        size_mb = os.path.getsize(new_path) / (1 << 20)
+        print(
+            f"generated two {args.rows + 1}x{args.cols} workbooks ({size_mb:.1f} MB each) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        for mode in args.modes:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_diff", "--child", mode, old_path, new_path],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{result['mode']:14} {result['seconds']:8.2f}s  "
+                f"peak RSS {result['peak_rss_mb']:8.1f} MB  ({result['result_size']} entries)"
+            )
+
+
+if __name__ == "__main__":
+    main()
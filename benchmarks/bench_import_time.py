@@ -0,0 +1,53 @@
+"""Report module import times of the server using ``python -X importtime``.
+
+Each module is imported in a fresh interpreter; the slowest imports by
+cumulative time are listed together with whether the optional heavy
+dependencies were loaded.
+
+Run with ``python -m benchmarks.bench_import_time excel_mcp.server``.
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+HEAVY = ("duckdb", "openpyxl", "win32com", "pythoncom", "fastmcp")
+
+
+def importtime(statement: str) -> Dict[str, Tuple[int, int]]:
+    """Run ``statement`` in a new interpreter; map module to ``(self_us, cumulative_us)``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["excel_mcp", "excel_mcp.db", "excel_mcp.server"])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        times = importtime(f"import {module}")
+        total = times.get(module, (0, 0))[1]
+        loaded = [name for name in HEAVY if name in times]
+        print(f"{module}: {total / 1000:.1f}ms, heavy dependencies: {', '.join(loaded) or 'none'}")
+        slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[: args.top]
+        for name, (own, cumulative) in slowest:
+            print(f"  {cumulative / 1000:>9.1f}ms {own / 1000:>8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
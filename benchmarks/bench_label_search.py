@@ -0,0 +1,101 @@
+"""Benchmark label search latency over a synthetic label corpus.
+
+Generates DCF-style labels (metric, qualifier, unit and period tokens) for a
+configurable number of workbooks/sheets, bulk loads them into DuckDB and
+times ``db.search_labels`` for exact, prefix, fuzzy and multi-token queries.
+
+Run with ``python -m benchmarks.bench_label_search --labels 1000000``.
+"""
+import argparse
+import csv
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from excel_mcp import db
+
+METRICS = [
+    "Revenue", "Net Revenue", "Gross Profit", "EBITDA", "Adj. EBITDA", "EBIT",
+    "Net Income", "Capex", "Maintenance Capex", "Change in NWC", "Free Cash Flow",
+    "Unlevered FCF", "WACC", "Cost of Equity", "Cost of Debt", "Tax Rate",
+    "Terminal Value", "Terminal Growth Rate", "Exit Multiple", "Enterprise Value",
+    "Equity Value", "Net Debt", "Shares Outstanding", "Share Price", "Beta",
+    "Risk-Free Rate", "Equity Risk Premium", "D&A", "Interest Expense", "Discount Factor",
+]
+QUALIFIERS = ["", "", "Adj.", "Reported", "Pro Forma", "LTM", "NTM", "Base Case", "Upside", "Downside"]
+UNITS = ["", "(USD m)", "(EUR m)", "(%)", "(x)", "($ per share)"]
+SEGMENTS = ["", "", "", "Segment A", "Segment B", "EMEA", "APAC", "Americas"]
+
+QUERIES = [
+    "ebitda", "WACC", "terminal growth", "free cash", "unlev", "ebidta",
+    "cost of eqity", "net debt fy2031", "adj ebitda usd", "share price",
+]
+
+
+def generate_corpus(path: str, labels: int, seed: int = 0) -> None:
+    """Write ``labels`` synthetic rows of (label, sheet_name, cell_address)."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        seen = set()
+        for i in range(labels):
+            if i % 5000 == 0:
+                seen.clear()
+            parts = [
+                rng.choice(QUALIFIERS),
+                rng.choice(METRICS),
+                rng.choice(SEGMENTS),
+                rng.choice(UNITS),
+                f"FY{rng.randint(2015, 2040)}",
+            ]
+            label = " ".join(p for p in parts if p)
+            # Labels are unique within a sheet, like a real label map.
+            if label in seen:
+                label = f"{label} #{i}"
+            seen.add(label)
+            sheet = f"Model{i // 5000}_DCF"
+            writer.writerow([label, sheet, f"{sheet}!C{i % 5000 + 1}"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default=":memory:")
+    args = parser.parse_args()
+
+    db.init_db(args.db)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "labels.csv")
+        start = time.perf_counter()
+        generate_corpus(corpus, args.labels)
+        db._db_conn.execute(
+            "INSERT INTO cell_labels SELECT 0, label, sheet_name, cell_address, now(), NULL "
+            "FROM read_csv(?, header=false, columns={'label': 'TEXT', 'sheet_name': 'TEXT', 'cell_address': 'TEXT'})",
+            (corpus,),
+        )
+        print(f"loaded {args.labels} labels in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    db.rebuild_label_index()
+    print(f"built index in {time.perf_counter() - start:.2f}s")
+
+    all_times = []
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = db.search_labels(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        all_times.extend(timings)
+        top = results[0][0] if results else "-"
+        print(f"{query!r:22} median {statistics.median(timings):6.2f}ms  max {max(timings):6.2f}ms  top: {top}")
+    all_times.sort()
+    p95 = all_times[int(len(all_times) * 0.95) - 1]
+    print(f"overall median {statistics.median(all_times):.2f}ms  p95 {p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
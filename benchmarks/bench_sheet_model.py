@@ -0,0 +1,105 @@
+"""Benchmark memory and speed of the compact sheet model on 1M cells.
+
+Builds the same synthetic DCF-shaped sheet in the address-keyed dictionary
+format and as a :class:`excel_mcp.sheet_model.SheetCells`, reports the
+memory each holds (via ``tracemalloc``) and times ``collect_column_outputs``
+and ``gather_row_outputs`` on both.
+
+Run with ``python -m benchmarks.bench_sheet_model --rows 50000 --cols 20``.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from openpyxl.utils.cell import get_column_letter
+
+from excel_mcp.sheet_model import SheetCells
+from excel_mcp.utils import collect_column_outputs, gather_row_outputs
+
+
+def synthetic_cells(rows: int, cols: int) -> Iterator[Tuple[int, int, Any, Optional[str]]]:
+    """Yield ``(row, col, output, formula)`` for a label column plus data."""
+    for r in range(1, rows + 1):
+        yield r, 1, f"Line item {r % 500}", None
+        for c in range(2, cols + 1):
+            if c % 4 == 0:
+                left = get_column_letter(c - 1)
+                yield r, c, r * 1.05 + c, f"={left}{r}*1.05"
+            else:
+                yield r, c, r * 10 + c, None
+
+
+def build_dict(rows: int, cols: int) -> Dict[str, Dict[str, Any]]:
+    cells: Dict[str, Dict[str, Any]] = {}
+    for r, c, output, formula in synthetic_cells(rows, cols):
+        info: Dict[str, Any] = {"output": output}
+        if formula is not None:
+            info["formula"] = formula
+        cells[f"{get_column_letter(c)}{r}"] = info
+    return cells
+
+
+def build_compact(rows: int, cols: int) -> SheetCells:
+    sheet = SheetCells("DCF")
+    for r, c, output, formula in synthetic_cells(rows, cols):
+        if formula is None:
+            sheet.append(r, c, output)
+        else:
+            sheet.append(r, c, output, formula)
+    return sheet
+
+
+def measure_build(builder, rows: int, cols: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = builder(rows, cols)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, elapsed, current
+
+
+def time_queries(cells, anchors) -> float:
+    start = time.perf_counter()
+    for anchor in anchors:
+        collect_column_outputs(cells, anchor)
+        gather_row_outputs(cells, anchor)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    n_cells = args.rows * args.cols
+    rng = random.Random(0)
+    anchors = [
+        f"{get_column_letter(rng.randint(2, args.cols))}{rng.randint(1, args.rows)}"
+        for _ in range(args.queries)
+    ]
+
+    cells, dict_build, dict_mem = measure_build(build_dict, args.rows, args.cols)
+    print(f"{n_cells} cells")
+    print(f"dict format : build {dict_build:6.2f}s  memory {dict_mem / 2**20:8.1f} MB  "
+          f"({dict_mem / n_cells:6.1f} B/cell)")
+    dict_query = time_queries(cells, anchors)
+    del cells
+
+    sheet, compact_build, compact_mem = measure_build(build_compact, args.rows, args.cols)
+    print(f"SheetCells  : build {compact_build:6.2f}s  memory {compact_mem / 2**20:8.1f} MB  "
+          f"({compact_mem / n_cells:6.1f} B/cell)")
+    first = time_queries(sheet, anchors[:1])
+    compact_query = time_queries(sheet, anchors)
+
+    print(f"{args.queries} column+row queries: dict input {dict_query * 1000:9.1f} ms total, "
+          f"SheetCells {compact_query * 1000:7.2f} ms total "
+          f"(first query incl. column index {first * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark peak RSS of normal versus streaming workbook scans.
+
+Generates a DCF-shaped workbook (label column followed by numeric inputs
+and formula columns) with openpyxl's write-only mode, then scans it in
+separate child processes so each mode reports its own peak RSS:
+
+* ``baseline`` - imports only
+* ``labels-normal`` / ``labels-streaming`` - label maps for every sheet
+* ``outputs-normal`` / ``outputs-streaming`` - column and row outputs
+  around an anchor in the middle of the sheet
+
+Run with ``python -m benchmarks.bench_streaming_scan --rows 100000``.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = [
+    "baseline",
+    "labels-normal",
+    "labels-streaming",
+    "outputs-normal",
+    "outputs-streaming",
+]
+
+
+def generate_workbook(path: str, rows: int, cols: int) -> None:
+    """Write a workbook with ``rows`` label rows of ``cols`` data columns."""
+    from openpyxl import Workbook
+    from openpyxl.utils.cell import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DCF")
+    ws.append(["Line item"] + [f"FY{2020 + c}" for c in range(cols)])
+    for r in range(2, rows + 2):
+        if r % 50 == 0:
+            ws.append([f"Section {r // 50}"])
+            continue
+        values = []
+        for c in range(cols):
+            if c % 3 == 2:
+                left = get_column_letter(c + 1)
+                values.append(f"={left}{r}*1.05")
+            else:
+                values.append(r * 10 + c)
+        ws.append([f"Line {r}"] + values)
+    wb.save(path)
+
+
+def _run_mode(mode: str, path: str, rows: int) -> dict:
+    """Execute one benchmark mode in the current process."""
+    from openpyxl import load_workbook
+
+    from excel_mcp import offline
+    from excel_mcp.utils import collect_column_outputs, gather_row_outputs
+
+    anchor = f"C{rows // 2 + 1}"
+    start = time.perf_counter()
+    detail = 0
+    if mode == "labels-normal":
+        wb = load_workbook(path)
+        detail = sum(len(m) for m in offline.build_workbook_label_maps(wb).values())
+    elif mode == "labels-streaming":
+        wb = load_workbook(path, read_only=True)
+        detail = sum(len(m) for m in offline.build_workbook_label_maps(wb).values())
+        wb.close()
+    elif mode == "outputs-normal":
+        formulas = load_workbook(path)["DCF"]
+        values = load_workbook(path, data_only=True)["DCF"]
+        cells = {}
+        for f_row, v_row in zip(formulas.iter_rows(), values.iter_rows()):
+            for f_cell, v_cell in zip(f_row, v_row):
+                if f_cell.value is None:
+                    continue
+                if f_cell.data_type == "f":
+                    output = f_cell.value if v_cell.value is None else v_cell.value
+                    cells[f_cell.coordinate] = {"output": output, "formula": f_cell.value}
+                else:
+                    cells[f_cell.coordinate] = {"output": f_cell.value}
+        detail = len(collect_column_outputs(cells, anchor)) + len(gather_row_outputs(cells, anchor))
+    elif mode == "outputs-streaming":
+        detail = len(offline.stream_column_outputs(path, "DCF", anchor))
+        detail += len(offline.stream_row_outputs(path, "DCF", anchor))
+    return {
+        "mode": mode,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "result_size": detail,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--modes", nargs="*", default=MODES, choices=MODES)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_mode(args.child[0], args.child[1], args.rows)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "large_model.xlsx")
+        start = time.perf_counter()
+        generate_workbook(path, args.rows, args.cols)
+        size_mb = os.path.getsize(path) / (1 << 20)
+        print(
+            f"generated {args.rows}x{args.cols + 1} workbook ({size_mb:.1f} MB) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        for mode in args.modes:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_streaming_scan",
+                 "--rows", str(args.rows), "--child", mode, path],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{result['mode']:18} {result['seconds']:8.2f}s  "
+                f"peak RSS {result['peak_rss_mb']:8.1f} MB  ({result['result_size']} entries)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+"""In-process stand-in for the Excel COM object model.
+
+Implements the subset of ``Excel.Application`` used by ``excel_mcp.server``
+on top of a plain cell dictionary, so tools can be exercised on Linux.
+Every property read or method call on a fake COM object counts as one COM
+round trip in ``FakeExcel.com_calls`` and can be slowed down by a fixed
+``latency`` to mimic cross-process COM. Formulas are evaluated by a small
+arithmetic evaluator; ``FakeExcel.recalcs`` counts full recalculations,
+which happen after every ``Value`` write in automatic calculation mode.
+"""
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+
+_REF = re.compile(r"(?:(\w+)!)?\$?([A-Z]{1,3})\$?(\d+)(?::\$?([A-Z]{1,3})\$?(\d+))?")
+
+XL_CALCULATION_AUTOMATIC = -4105
+XL_CALCULATION_MANUAL = -4135
+
+Cell = Tuple[int, int]
+
+
+class _Dispatch:
+    """Base of the fake COM objects.
+
+    ``_oleobj_`` marks them like pywin32's dispatch wrappers, so a
+    :func:`excel_mcp.metrics.com_proxy` follows them through the model.
+    """
+
+    _oleobj_ = None
+
+
+class FakeExcel(_Dispatch):
+    """Fake ``Excel.Application`` holding a single active workbook."""
+
+    def __init__(self, workbook: "FakeWorkbook", latency: float = 0.0):
+        self.latency = latency
+        self.com_calls = 0
+        self.recalcs = 0
+        self.Visible = False
+        self._calculation = XL_CALCULATION_AUTOMATIC
+        self._screen_updating = True
+        self._enable_events = True
+        workbook._app = self
+        self._workbook = workbook
+
+    def _tick(self) -> None:
+        """Record one COM round trip."""
+        self.com_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset_counters(self) -> None:
+        self.com_calls = 0
+        self.recalcs = 0
+
+    def _changed(self) -> None:
+        if self._calculation == XL_CALCULATION_AUTOMATIC:
+            self._recalculate()
+
+    def _recalculate(self) -> None:
+        self.recalcs += 1
+        for sheet in self._workbook._sheets.values():
+            sheet.calculate()
+
+    @property
+    def ActiveWorkbook(self) -> "FakeWorkbook":  # pylint: disable=invalid-name
+        self._tick()
+        return self._workbook
+
+    @property
+    def Calculation(self) -> int:  # pylint: disable=invalid-name
+        self._tick()
+        return self._calculation
+
+    @Calculation.setter
+    def Calculation(self, mode: int) -> None:  # pylint: disable=invalid-name
+        self._tick()
+        self._calculation = mode
+
+    @property
+    def ScreenUpdating(self) -> bool:  # pylint: disable=invalid-name
+        self._tick()
+        return self._screen_updating
+
+    @ScreenUpdating.setter
+    def ScreenUpdating(self, value: bool) -> None:  # pylint: disable=invalid-name
+        self._tick()
+        self._screen_updating = value
+
+    @property
+    def EnableEvents(self) -> bool:  # pylint: disable=invalid-name
+        self._tick()
+        return self._enable_events
+
+    @EnableEvents.setter
+    def EnableEvents(self, value: bool) -> None:  # pylint: disable=invalid-name
+        self._tick()
+        self._enable_events = value
+
+    def Calculate(self) -> None:  # pylint: disable=invalid-name
+        self._tick()
+        self._recalculate()
+
+
+class FakeName(_Dispatch):
+    """Workbook-level defined name."""
+
+    def __init__(self, sheet: "FakeWorksheet", name: str, ref: str):
+        self._sheet = sheet
+        self._name = name
+        self._ref = ref
+
+    @property
+    def Name(self) -> str:  # pylint: disable=invalid-name
+        self._sheet._app._tick()
+        return self._name
+
+    @property
+    def RefersToRange(self) -> "FakeRange":  # pylint: disable=invalid-name
+        self._sheet._app._tick()
+        return self._sheet._range(self._ref)
+
+
+class FakeWorkbook(_Dispatch):
+    """Workbook with worksheets and defined names."""
+
+    def __init__(self, name: str = "Model.xlsx", full_name: Optional[str] = None):
+        self._name = name
+        self._full_name = full_name or name
+        self._app: Optional[FakeExcel] = None
+        self._sheets: Dict[str, FakeWorksheet] = {}
+        self._names: List[FakeName] = []
+
+    def add_sheet(self, name: str) -> "FakeWorksheet":
+        ws = FakeWorksheet(self, name)
+        self._sheets[name] = ws
+        return ws
+
+    def add_name(self, name: str, sheet: str, ref: str) -> None:
+        self._names.append(FakeName(self._sheets[sheet], name, ref))
+
+    @property
+    def Name(self) -> str:  # pylint: disable=invalid-name
+        self._app._tick()
+        return self._name
+
+    @property
+    def FullName(self) -> str:  # pylint: disable=invalid-name
+        self._app._tick()
+        return self._full_name
+
+    def Worksheets(self, name: str) -> "FakeWorksheet":  # pylint: disable=invalid-name
+        self._app._tick()
+        return self._sheets[name]
+
+    @property
+    def ActiveSheet(self) -> "FakeWorksheet":  # pylint: disable=invalid-name
+        self._app._tick()
+        return next(iter(self._sheets.values()))
+
+    @property
+    def Names(self) -> "_Names":  # pylint: disable=invalid-name
+        self._app._tick()
+        return _Names(list(self._names))
+
+
+class _Names(_Dispatch):
+    """``Workbook.Names`` collection."""
+
+    def __init__(self, names: List["FakeName"]):
+        self._names = names
+
+    def __iter__(self) -> Iterator["FakeName"]:
+        return iter(self._names)
+
+
+class FakeWorksheet(_Dispatch):
+    """Worksheet storing ``(value, formula)`` per cell and formula references."""
+
+    def __init__(self, workbook: FakeWorkbook, name: str):
+        self._workbook = workbook
+        self._name = name
+        self.cells: Dict[Cell, Tuple[Any, str]] = {}
+        self._precedents: Dict[Cell, List[Cell]] = {}
+        self._dependents: Dict[Cell, Set[Cell]] = {}
+
+    @property
+    def _app(self) -> FakeExcel:
+        return self._workbook._app
+
+    def set(self, address: str, value: Any, formula: str = "") -> None:
+        """Store a cell; formula references on this sheet are indexed."""
+        cell = coordinate_to_tuple(address)
+        self.cells[cell] = (value, formula)
+        for prec in self._precedents.pop(cell, []):
+            self._dependents[prec].discard(cell)
+        if formula:
+            precs = list(_formula_cells(formula))
+            self._precedents[cell] = precs
+            for prec in precs:
+                self._dependents.setdefault(prec, set()).add(cell)
+
+    def calculate(self) -> None:
+        """Re-evaluate every formula cell from its precedents."""
+        done: Set[Cell] = set()
+
+        def value(row: int, col: int) -> Any:
+            cell = (row, col)
+            current, formula = self.cells.get(cell, (None, ""))
+            if formula and cell not in done:
+                done.add(cell)
+                current = eval(_compile(formula), {"__builtins__": {}}, env)  # pylint: disable=eval-used
+                self.cells[cell] = (current, formula)
+            return 0 if current is None else current
+
+        def cells(row: int, col: int, end_row: int, end_col: int) -> List[Any]:
+            return [value(r, c) for r in range(row, end_row + 1) for c in range(col, end_col + 1)]
+
+        env = {"_v": value, "_rng": cells, "_sum": sum}
+        for row, col in list(self.cells):
+            value(row, col)
+
+    def _range(self, ref: str) -> "FakeRange":
+        min_col, min_row, max_col, max_row = range_boundaries(ref.replace("$", ""))
+        return FakeRange(self, min_row, min_col, max_row, max_col)
+
+    @property
+    def Name(self) -> str:  # pylint: disable=invalid-name
+        self._app._tick()
+        return self._name
+
+    def Range(self, ref: str) -> "FakeRange":  # pylint: disable=invalid-name
+        self._app._tick()
+        return self._range(ref)
+
+    def Cells(self, row: int, col: int) -> "FakeRange":  # pylint: disable=invalid-name
+        self._app._tick()
+        return FakeRange(self, row, col, row, col)
+
+    @property
+    def UsedRange(self) -> "FakeRange":  # pylint: disable=invalid-name
+        self._app._tick()
+        rows = [r for r, _ in self.cells]
+        cols = [c for _, c in self.cells]
+        return FakeRange(self, min(rows), min(cols), max(rows), max(cols))
+
+
+def _formula_cells(formula: str) -> Iterator[Cell]:
+    """Yield same-sheet cells referenced by ``formula``, expanding ranges."""
+    for match in _REF.finditer(formula.lstrip("=")):
+        if match.group(1):
+            continue
+        row, col = int(match.group(3)), _column_index(match.group(2))
+        if match.group(4):
+            end_row, end_col = int(match.group(5)), _column_index(match.group(4))
+            for r in range(row, end_row + 1):
+                for c in range(col, end_col + 1):
+                    yield r, c
+        else:
+            yield row, col
+
+
+_compiled: Dict[str, Any] = {}
+
+
+def _compile(formula: str) -> Any:
+    """Translate an arithmetic/SUM formula into a Python code object."""
+    code = _compiled.get(formula)
+    if code is None:
+        def ref(match: "re.Match") -> str:
+            row, col = int(match.group(3)), _column_index(match.group(2))
+            if match.group(4):
+                return f"_rng({row}, {col}, {int(match.group(5))}, {_column_index(match.group(4))})"
+            return f"_v({row}, {col})"
+
+        expr = _REF.sub(ref, formula.lstrip("=")).replace("SUM(", "_sum(").replace("^", "**")
+        code = _compiled[formula] = compile(expr, formula, "eval")
+    return code
+
+
+def _column_index(letters: str) -> int:
+    return coordinate_to_tuple(f"{letters}1")[1]
+
+
+class _Address(str):
+    """COM ``Address`` is read both as a property and with arguments."""
+
+    def __new__(cls, rng: "FakeRange"):
+        obj = super().__new__(cls, rng._address(True, True))
+        obj._rng = rng
+        return obj
+
+    def __call__(self, row_absolute: bool = True, column_absolute: bool = True) -> str:
+        return self._rng._address(row_absolute, column_absolute)
+
+
+class _Count(_Dispatch):
+    def __init__(self, sheet: FakeWorksheet, count: int):
+        self._sheet = sheet
+        self._count = count
+
+    @property
+    def Count(self) -> int:  # pylint: disable=invalid-name
+        self._sheet._app._tick()
+        return self._count
+
+
+class FakeRange(_Dispatch):
+    """Rectangular range of a :class:`FakeWorksheet`."""
+
+    def __init__(self, sheet: FakeWorksheet, row: int, col: int, end_row: int, end_col: int):
+        self._sheet = sheet
+        self._row = row
+        self._col = col
+        self._end_row = end_row
+        self._end_col = end_col
+
+    def _tick(self) -> None:
+        self._sheet._app._tick()
+
+    def _cells(self) -> Iterator[Cell]:
+        for r in range(self._row, self._end_row + 1):
+            for c in range(self._col, self._end_col + 1):
+                yield r, c
+
+    def _single(self) -> bool:
+        return self._row == self._end_row and self._col == self._end_col
+
+    def _address(self, row_absolute: bool, column_absolute: bool) -> str:
+        def fmt(row: int, col: int) -> str:
+            col_part = ("$" if column_absolute else "") + get_column_letter(col)
+            return f"{col_part}{'$' if row_absolute else ''}{row}"
+
+        start = fmt(self._row, self._col)
+        if self._single():
+            return start
+        return f"{start}:{fmt(self._end_row, self._end_col)}"
+
+    def _grid(self, index: int) -> Any:
+        values = tuple(
+            tuple(self._sheet.cells.get((r, c), (None, ""))[index] for c in range(self._col, self._end_col + 1))
+            for r in range(self._row, self._end_row + 1)
+        )
+        return values[0][0] if self._single() else values
+
+    @property
+    def Formula(self) -> Any:  # pylint: disable=invalid-name
+        self._tick()
+        return self._grid(1)
+
+    @property
+    def Value(self) -> Any:  # pylint: disable=invalid-name
+        self._tick()
+        return self._grid(0)
+
+    @Value.setter
+    def Value(self, value: Any) -> None:  # pylint: disable=invalid-name
+        self._tick()
+        rows = value if isinstance(value, (tuple, list)) else ((value,),)
+        for r, row_values in enumerate(rows, start=self._row):
+            for c, cell_value in enumerate(row_values, start=self._col):
+                self._sheet.set(f"{get_column_letter(c)}{r}", cell_value)
+        self._sheet._app._changed()
+
+    @property
+    def Address(self) -> _Address:  # pylint: disable=invalid-name
+        self._tick()
+        return _Address(self)
+
+    @property
+    def Row(self) -> int:  # pylint: disable=invalid-name
+        self._tick()
+        return self._row
+
+    @property
+    def Column(self) -> int:  # pylint: disable=invalid-name
+        self._tick()
+        return self._col
+
+    @property
+    def Rows(self) -> _Count:  # pylint: disable=invalid-name
+        self._tick()
+        return _Count(self._sheet, self._end_row - self._row + 1)
+
+    @property
+    def Columns(self) -> _Count:  # pylint: disable=invalid-name
+        self._tick()
+        return _Count(self._sheet, self._end_col - self._col + 1)
+
+    @property
+    def Worksheet(self) -> FakeWorksheet:  # pylint: disable=invalid-name
+        self._tick()
+        return self._sheet
+
+    def Cells(self, row: int, col: int) -> "FakeRange":  # pylint: disable=invalid-name
+        self._tick()
+        r, c = self._row + row - 1, self._col + col - 1
+        return FakeRange(self._sheet, r, c, r, c)
+
+    def Offset(self, row_offset: int, col_offset: int) -> "FakeRange":  # pylint: disable=invalid-name
+        self._tick()
+        r, c = self._row + row_offset, self._col + col_offset
+        if r < 1 or c < 1:
+            raise ValueError("offset outside the sheet")
+        return FakeRange(self._sheet, r, c, r, c)
+
+    def _linked(self, graph: Dict[Cell, Any]) -> "_CellList":
+        self._tick()
+        linked: List[Cell] = []
+        for cell in self._cells():
+            linked.extend(sorted(graph.get(cell, ())))
+        if not linked:
+            raise ValueError("No cells were found.")
+        return _CellList(self._sheet, linked)
+
+    @property
+    def Precedents(self) -> "_CellList":  # pylint: disable=invalid-name
+        return self._linked(self._sheet._precedents)
+
+    @property
+    def Dependents(self) -> "_CellList":  # pylint: disable=invalid-name
+        return self._linked(self._sheet._dependents)
+
+    def __iter__(self) -> Iterator["FakeRange"]:
+        for r, c in self._cells():
+            self._tick()
+            yield FakeRange(self._sheet, r, c, r, c)
+
+
+class _CellList(_Dispatch):
+    """Union of cells returned by ``Precedents``/``Dependents``."""
+
+    def __init__(self, sheet: FakeWorksheet, cells: List[Cell]):
+        self._sheet = sheet
+        self._cells = cells
+
+    def __iter__(self) -> Iterator[FakeRange]:
+        for r, c in self._cells:
+            self._sheet._app._tick()
+            yield FakeRange(self._sheet, r, c, r, c)
+
+
+def dcf_workbook(years: int = 10, line_items: int = 10, name: str = "DCF.xlsx") -> FakeWorkbook:
+    """Build a DCF-shaped workbook with ``years`` projection columns.
+
+    Layout: assumption block (label in column A, value in B), a year header
+    row, revenue through discounted free cash flow projections and
+    ``line_items`` extra cost lines feeding EBITDA, then valuation outputs.
+    Assumptions are exposed as defined names.
+    """
+    wb = FakeWorkbook(name)
+    ws = wb.add_sheet("DCF")
+    ws.set("A1", "DCF Model")
+
+    assumptions = [
+        ("Revenue Growth", 0.05), ("EBITDA Margin", 0.3), ("Tax Rate", 0.25),
+        ("WACC", 0.09), ("Terminal Growth", 0.02),
+    ]
+    for i, (label, value) in enumerate(assumptions, start=3):
+        ws.set(f"A{i}", label)
+        ws.set(f"B{i}", value)
+    growth, margin, tax, wacc, terminal = (f"$B${i}" for i in range(3, 8))
+    for label, ref in (("RevenueGrowth", "B3"), ("TaxRate", "B5"), ("WACC_Rate", "B6")):
+        wb.add_name(label, "DCF", ref)
+
+    header = 9
+    ws.set(f"A{header}", "Year")
+    cols = [get_column_letter(c) for c in range(2, years + 2)]
+    for n, col in enumerate(cols, start=1):
+        ws.set(f"{col}{header}", 2024 + n)
+
+    row = header + 1
+    revenue_row = row
+    ws.set(f"A{row}", "Revenue")
+    revenue = 1000.0
+    revenues = []
+    for n, col in enumerate(cols):
+        if n == 0:
+            ws.set(f"{col}{row}", revenue)
+        else:
+            revenue *= 1.05
+            ws.set(f"{col}{row}", revenue, f"={cols[n - 1]}{row}*(1+{growth})")
+        revenues.append(revenue)
+
+    cost_rows = []
+    for k in range(line_items):
+        row += 1
+        cost_rows.append(row)
+        ws.set(f"A{row}", f"Cost Line {k + 1}")
+        for n, col in enumerate(cols):
+            ws.set(f"{col}{row}", revenues[n] * 0.01, f"={col}{revenue_row}*0.01")
+
+    def add_row(label: str, formula_for) -> int:
+        nonlocal row
+        row += 1
+        ws.set(f"A{row}", label)
+        for col in cols:
+            ws.set(f"{col}{row}", 0.0, formula_for(col))
+        return row
+
+    costs = f"{{col}}{cost_rows[0]}:{{col}}{cost_rows[-1]}" if cost_rows else None
+    ebitda = add_row(
+        "EBITDA",
+        lambda col: f"={col}{revenue_row}*{margin}" + (f"-SUM({costs.format(col=col)})" if costs else ""),
+    )
+    taxes = add_row("Taxes", lambda col: f"={col}{ebitda}*{tax}")
+    fcf = add_row("Free Cash Flow", lambda col: f"={col}{ebitda}-{col}{taxes}")
+    factor = add_row("Discount Factor", lambda col: f"=1/(1+{wacc})^({col}{header}-2024)")
+    pv = add_row("PV of FCF", lambda col: f"={col}{fcf}*{col}{factor}")
+
+    last = cols[-1]
+    row += 2
+    ws.set(f"A{row}", "Terminal Value")
+    ws.set(f"B{row}", 0.0, f"={last}{fcf}*(1+{terminal})/({wacc}-{terminal})")
+    tv = row
+    row += 1
+    ws.set(f"A{row}", "Enterprise Value")
+    ws.set(f"B{row}", 0.0, f"=SUM({cols[0]}{pv}:{last}{pv})+B{tv}*{last}{factor}")
+    ws.calculate()
+    return wb
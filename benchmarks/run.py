@@ -0,0 +1,218 @@
+"""Benchmark suite for the server tools, the utils helpers and the DB layer.
+
+COM-backed tools run against :mod:`benchmarks.fake_excel` on a synthetic
+DCF workbook, so the suite runs without Excel. Each case records the best
+and median wall time over ``--repeat`` runs and, for COM cases, the number
+of COM round trips per run. Results are written as JSON and compared
+against a stored baseline: a case regresses when its best time grows by
+more than ``--threshold`` or when it makes more COM calls than recorded.
+
+Run with ``python -m benchmarks.run``; refresh the baseline on the
+reference machine with ``python -m benchmarks.run --update-baseline``.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+from openpyxl.utils.cell import get_column_letter
+
+from excel_mcp import db
+from excel_mcp.sheet_model import SheetCells
+from excel_mcp.utils import address_within_ranges, collect_column_outputs, gather_row_outputs
+
+from .fake_excel import FakeExcel, dcf_workbook
+
+server = import_module("excel_mcp.server")
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+Case = Tuple[str, Callable[[], Any], Optional[FakeExcel]]
+
+
+def _com_cases(app: FakeExcel, years: int) -> List[Case]:
+    sheet = app._workbook._sheets["DCF"]
+    last = max(r for r, _ in sheet.cells)
+    anchor = f"{get_column_letter(years + 1)}{last - 4}"
+    inputs = {f"B{row}": value for row, value in zip(range(3, 8), (0.06, 0.32, 0.24, 0.085, 0.025))}
+    inputs.update({f"{get_column_letter(c)}9": 2024 + c for c in range(2, years + 2)})
+
+    def call(tool, *args, **kwargs):
+        def run():
+            result = tool.fn(*args, **kwargs)
+            if result["status"] != "success":
+                raise RuntimeError(result["reason"])
+            return result
+        return run
+
+    return [
+        ("build_label_address_map", call(server.build_label_address_map, "DCF"), app),
+        ("find_cell_labels", call(server.find_cell_labels, "DCF", anchor, 2), app),
+        ("trace_precedents", call(server.trace_precedents, "DCF", f"B{last}"), app),
+        ("trace_dependents", call(server.trace_dependents, "DCF", "B3"), app),
+        ("get_formula", call(server.get_formula, "DCF", anchor), app),
+        ("set_inputs", call(server.set_inputs, inputs, [f"B{last}"]), app),
+    ]
+
+
+def _db_cases(labels: int) -> List[Case]:
+    label_map = {f"Line item {i} margin": f"DCF!B{i + 2}" for i in range(labels)}
+
+    def store():
+        db.store_label_map("DCF", label_map)
+
+    def query():
+        for i in range(0, labels, max(1, labels // 50)):
+            db.query_label(f"Line item {i} margin")
+
+    def search():
+        for term in ("margin", "line item 1", "lne"):
+            db.search_labels(term)
+
+    return [("store_label_map", store, None), ("query_label", query, None), ("search_labels", search, None)]
+
+
+def _utils_cases(rows: int, cols: int) -> List[Case]:
+    cells: Dict[str, Dict[str, Any]] = {}
+    for r in range(1, rows + 1):
+        cells[f"A{r}"] = {"output": f"Line item {r}"}
+        for c in range(2, cols + 1):
+            cells[f"{get_column_letter(c)}{r}"] = {"output": r * c * 1.5, "formula": f"=A{r}*{c}"}
+    sheet = SheetCells.from_cells(cells, "DCF")
+    anchor = f"{get_column_letter(cols // 2)}{rows // 2}"
+    ranges = [f"{get_column_letter(c)}1:{get_column_letter(c)}{rows}" for c in range(2, cols + 1, 3)]
+
+    def outputs(data):
+        def run():
+            collect_column_outputs(data, anchor)
+            gather_row_outputs(data, anchor)
+        return run
+
+    def within():
+        for r in range(1, rows + 1, max(1, rows // 200)):
+            address_within_ranges(f"{get_column_letter(cols)}{r}", ranges)
+
+    return [
+        ("outputs_dict", outputs(cells), None),
+        ("outputs_sheet_cells", outputs(sheet), None),
+        ("address_within_ranges", within, None),
+    ]
+
+
+def _measure(run: Callable[[], Any], app: Optional[FakeExcel], repeat: int) -> Dict[str, Any]:
+    times = []
+    calls = 0
+    for _ in range(repeat):
+        if app is not None:
+            app.reset_counters()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        if app is not None:
+            calls = app.com_calls
+    result: Dict[str, Any] = {"seconds": min(times), "median_seconds": statistics.median(times)}
+    if app is not None:
+        result["com_calls"] = calls
+    return result
+
+
+def run_suite(
+    years: int = 10,
+    line_items: int = 40,
+    labels: int = 2000,
+    rows: int = 2000,
+    cols: int = 20,
+    latency: float = 0.0,
+    repeat: int = 5,
+) -> Dict[str, Dict[str, Any]]:
+    """Run every case and return ``{case: {"seconds", "median_seconds", ["com_calls"]}}``."""
+    app = FakeExcel(dcf_workbook(years=years, line_items=line_items), latency=latency)
+    results: Dict[str, Dict[str, Any]] = {}
+    db.init_db(":memory:")
+    try:
+        with patch.object(server, "win32", object()), patch.object(server, "excel_app", app):
+            cases = _com_cases(app, years) + _db_cases(labels) + _utils_cases(rows, cols)
+            for name, run, case_app in cases:
+                results[name] = _measure(run, case_app, repeat)
+    finally:
+        db._db_conn.close()
+        db._db_conn = None
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+    min_delta: float = 0.001,
+) -> List[str]:
+    """Return a description of every case that regressed against ``baseline``.
+
+    Slowdowns smaller than ``min_delta`` seconds are treated as noise.
+    """
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        limit = max(base["seconds"] * (1 + threshold), base["seconds"] + min_delta)
+        if current["seconds"] > limit:
+            regressions.append(
+                f"{name}: {current['seconds'] * 1000:.2f}ms > {base['seconds'] * 1000:.2f}ms +{threshold:.0%}"
+            )
+        if current.get("com_calls", 0) > base.get("com_calls", 0):
+            regressions.append(f"{name}: {current['com_calls']} COM calls > {base['com_calls']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--line-items", type=int, default=40)
+    parser.add_argument("--labels", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake COM call")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns below this many seconds")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        years=args.years, line_items=args.line_items, labels=args.labels,
+        rows=args.rows, cols=args.cols, latency=args.latency, repeat=args.repeat,
+    )
+    for name, result in results.items():
+        calls = f"  {result['com_calls']:>6} COM calls" if "com_calls" in result else ""
+        print(f"{name:<24} {result['seconds'] * 1000:>10.2f}ms{calls}")
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against")
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,26 @@
-from .server import server
+import sys
+import types
+from importlib import import_module
 
 __all__ = ["server"]
+
+
+class _Package(types.ModuleType):
+    """Package module whose ``server`` attribute is loaded on first access.
+
+    The FastMCP instance lives in the ``excel_mcp.server`` submodule, so
+    ``import excel_mcp.db`` no longer starts FastMCP. Importing the
+    submodule binds it on the package; the setter ignores that so
+    ``excel_mcp.server`` keeps resolving to the instance.
+    """
+
+    @property
+    def server(self):
+        return import_module(f"{__name__}.server").server
+
+    @server.setter
+    def server(self, _module):
+        pass
+
+
+sys.modules[__name__].__class__ = _Package
@@ -1,49 +1,751 @@
-import duckdb
+import os
+import re
 import time
-from typing import Dict, Optional, List, Tuple
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, Dict, Optional, List, Set, Tuple
 
-_db_conn: Optional[duckdb.DuckDBPyConnection] = None
+from . import metrics
 
+if TYPE_CHECKING:
+    import duckdb
 
+_db_conn: Optional["duckdb.DuckDBPyConnection"] = None
+# Sorted copy of ``label_vocab`` used to expand query tokens without a
+# database round trip; reset whenever the index changes.
+_vocab_cache: Optional[Tuple[List[str], Dict[str, int]]] = None
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Upper bound on rows pulled from ``label_tokens`` for a single search; keeps
+# latency flat when a query token appears in a large share of the labels.
+_SEARCH_CANDIDATES = 200
+# Vocabulary expansions considered per query token.
+_PREFIX_EXPANSIONS = 50
+_FUZZY_EXPANSIONS = 10
+_FUZZY_THRESHOLD = 0.8
+# Exact label lookups; DuckDB only uses the index for a plain filtered scan,
+# not inside a join.
+_NORM_LABEL_INDEX = "CREATE INDEX IF NOT EXISTS cell_labels_norm ON cell_labels(norm_label)"
+# Rows bound per statement when writing label maps.
+_WRITE_CHUNK = 1000
+
+
+@metrics.instrument("db")
 def init_db(path: str = "excel_mcp.db") -> None:
     """Initialize DuckDB connection and create tables if needed."""
-    global _db_conn
+    global _db_conn, _vocab_cache
+    import duckdb  # deferred: only tools that use the database pay for it
+
     _db_conn = duckdb.connect(path)
+    _vocab_cache = None
+    # Case and punctuation folding shared by indexing and search so both
+    # sides always agree on token boundaries.
+    _db_conn.execute(
+        """
+        CREATE OR REPLACE MACRO normalize_label(s) AS
+            trim(regexp_replace(lower(s), '[^a-z0-9]+', ' ', 'g'))
+        """
+    )
+    # One of 64 bits per token, mirrored by ``_token_bit``. A label's mask
+    # ORs the bits of its tokens so searches can test for the other query
+    # tokens without joining token rows.
+    _db_conn.execute(
+        """
+        CREATE OR REPLACE MACRO token_bit(x) AS
+            (strlen(x) * 7 + ascii(x) * 3 + ascii(substr(x, 2, 1)) * 11
+             + ascii(substr(x, -1, 1)) * 5) % 64
+        """
+    )
+    _db_conn.execute(
+        """
+        CREATE OR REPLACE MACRO token_mask(s) AS
+            list_aggregate(
+                list_transform(string_split(s, ' '), x -> 1::UBIGINT << token_bit(x)::INTEGER),
+                'bit_or'
+            )
+        """
+    )
+    _db_conn.execute("CREATE SEQUENCE IF NOT EXISTS workbook_id_seq START 1")
+    _db_conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS workbooks(
+            workbook_id INTEGER PRIMARY KEY,
+            path TEXT,
+            content_hash TEXT,
+            version INTEGER,
+            is_latest BOOLEAN,
+            modified TIMESTAMP,
+            created_at TIMESTAMP,
+            last_updated TIMESTAMP,
+            UNIQUE(path, content_hash)
+        )
+        """
+    )
+    # Set once every sheet of a version has been scanned; catalog runs skip
+    # only those versions.
+    _db_conn.execute(
+        "ALTER TABLE workbooks ADD COLUMN IF NOT EXISTS cataloged BOOLEAN DEFAULT FALSE"
+    )
+    # Workbook 0 owns mappings whose source workbook is unknown.
+    _db_conn.execute(
+        """
+        INSERT OR IGNORE INTO workbooks
+        VALUES (0, '', '', 1, TRUE, NULL, now(), now(), FALSE)
+        """
+    )
+    columns = {
+        r[0]
+        for r in _db_conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'cell_labels'"
+        ).fetchall()
+    }
+    legacy = bool(columns) and "workbook_id" not in columns
+    if legacy:
+        _db_conn.execute("ALTER TABLE cell_labels RENAME TO cell_labels_legacy")
     _db_conn.execute(
         """
         CREATE TABLE IF NOT EXISTS cell_labels(
+            workbook_id INTEGER,
             label TEXT,
             sheet_name TEXT,
             cell_address TEXT,
             last_updated TIMESTAMP,
-            PRIMARY KEY(label, sheet_name)
+            norm_label TEXT,
+            PRIMARY KEY(workbook_id, label, sheet_name)
+        )
+        """
+    )
+    if legacy:
+        _db_conn.execute(
+            """
+            INSERT INTO cell_labels
+            SELECT 0, label, sheet_name, cell_address, last_updated, normalize_label(label)
+            FROM cell_labels_legacy
+            """
+        )
+        _db_conn.execute("DROP TABLE cell_labels_legacy")
+    _db_conn.execute(_NORM_LABEL_INDEX)
+    token_columns = {
+        r[0]
+        for r in _db_conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'label_tokens'"
+        ).fetchall()
+    }
+    reindex = legacy or (bool(token_columns) and "token_mask" not in token_columns)
+    if reindex:
+        _db_conn.execute("DROP TABLE IF EXISTS label_tokens")
+    _db_conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS label_tokens(
+            token TEXT,
+            workbook_id INTEGER,
+            label TEXT,
+            sheet_name TEXT,
+            cell_address TEXT,
+            norm_label TEXT,
+            token_mask UBIGINT
+        )
+        """
+    )
+    _db_conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS label_vocab(
+            token TEXT PRIMARY KEY,
+            doc_count BIGINT
+        )
+        """
+    )
+    # Hashed row blocks of snapshotted workbook versions, see ``diff``.
+    _db_conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sheet_blocks(
+            workbook_id INTEGER,
+            sheet_name TEXT,
+            block INTEGER,
+            digest BLOB,
+            row_digests BLOB,
+            PRIMARY KEY(workbook_id, sheet_name, block)
+        )
+        """
+    )
+    if reindex:
+        rebuild_label_index()
+
+
+def is_connected() -> bool:
+    """Return ``True`` once :func:`init_db` has opened a database."""
+    return _db_conn is not None
+
+
+@metrics.instrument("db")
+def register_workbook(path: str, content_hash: str, modified: Optional[float] = None) -> int:
+    """Return the id of the workbook version identified by path and hash.
+
+    A hash not seen before for ``path`` is recorded as a new version. The
+    registered version, new or known, becomes the latest one for ``path``.
+    """
+    if _db_conn is None:
+        return 0
+    path = os.path.abspath(path)
+    row = _db_conn.execute(
+        "SELECT workbook_id FROM workbooks WHERE path = ? AND content_hash = ?",
+        (path, content_hash),
+    ).fetchone()
+    if row is not None:
+        _db_conn.execute(
+            """
+            UPDATE workbooks
+            SET is_latest = (workbook_id = ?),
+                last_updated = CASE WHEN workbook_id = ? THEN now() ELSE last_updated END
+            WHERE path = ?
+            """,
+            (row[0], row[0], path),
+        )
+        return row[0]
+    version = _db_conn.execute(
+        "SELECT coalesce(max(version), 0) + 1 FROM workbooks WHERE path = ?",
+        (path,),
+    ).fetchone()[0]
+    _db_conn.execute("UPDATE workbooks SET is_latest = FALSE WHERE path = ?", (path,))
+    workbook_id = _db_conn.execute("SELECT nextval('workbook_id_seq')").fetchone()[0]
+    _db_conn.execute(
+        "INSERT INTO workbooks VALUES (?, ?, ?, ?, TRUE, to_timestamp(?), now(), now(), FALSE)",
+        (workbook_id, path, content_hash, version, modified),
+    )
+    metrics.count("db.rows_written")
+    return workbook_id
+
+
+@metrics.instrument("db")
+def find_workbook(path: str, content_hash: str) -> Optional[int]:
+    """Return the id of an already registered workbook version, if any."""
+    if _db_conn is None:
+        return None
+    row = _db_conn.execute(
+        "SELECT workbook_id FROM workbooks WHERE path = ? AND content_hash = ?",
+        (os.path.abspath(path), content_hash),
+    ).fetchone()
+    return row[0] if row else None
+
+
+@metrics.instrument("db")
+def list_workbooks(
+    all_versions: bool = False, cataloged_only: bool = False
+) -> List[Tuple[str, str, int, int]]:
+    """Return ``(path, content_hash, version, label_count)`` per workbook.
+
+    ``cataloged_only`` skips versions that not every sheet was scanned for.
+    """
+    if _db_conn is None:
+        return []
+    return _db_conn.execute(
+        """
+        SELECT w.path, w.content_hash, w.version, count(c.label)
+        FROM workbooks w LEFT JOIN cell_labels c USING (workbook_id)
+        WHERE w.workbook_id <> 0 AND (w.is_latest OR ?) AND (w.cataloged OR NOT ?)
+        GROUP BY ALL
+        ORDER BY w.path, w.version
+        """,
+        (all_versions, cataloged_only),
+    ).fetchall()
+
+
+def _carry_labels_forward(previous_id: int, workbook_id: int, skip_sheets: List[str]) -> None:
+    """Copy labels of ``previous_id`` to ``workbook_id``, except ``skip_sheets``."""
+    global _vocab_cache
+    params = (workbook_id, previous_id, skip_sheets)
+    _db_conn.execute(
+        """
+        INSERT INTO cell_labels
+        SELECT ?, label, sheet_name, cell_address, last_updated, norm_label
+        FROM cell_labels
+        WHERE workbook_id = ? AND NOT list_contains(?::VARCHAR[], sheet_name)
+        """,
+        params,
+    )
+    _db_conn.execute(
+        """
+        INSERT INTO label_tokens
+        SELECT token, ?, label, sheet_name, cell_address, norm_label, token_mask
+        FROM label_tokens
+        WHERE workbook_id = ? AND NOT list_contains(?::VARCHAR[], sheet_name)
+        """,
+        params,
+    )
+    _vocab_cache = None
+    _db_conn.execute(
+        """
+        INSERT OR REPLACE INTO label_vocab
+        SELECT token, count(*) FROM label_tokens
+        WHERE token IN (SELECT token FROM label_tokens WHERE workbook_id = ?)
+        GROUP BY token
+        """,
+        (workbook_id,),
+    )
+
+
+@metrics.instrument("db")
+def store_workbook_labels(
+    path: str,
+    content_hash: str,
+    label_maps: Dict[str, Dict[str, str]],
+    modified: Optional[float] = None,
+    cataloged: bool = False,
+    blocks: Optional[Dict[str, List[Tuple[int, bytes, bytes]]]] = None,
+) -> int:
+    """Register a workbook version and store label maps of its sheets.
+
+    Both happen in one transaction together with the snapshot ``blocks``
+    of each sheet, if given, so a failure never leaves a version recorded
+    without its labels or blocks. ``cataloged`` marks ``label_maps`` as a
+    scan of every sheet. For a partial scan of a new version of ``path``,
+    labels of the sheets not in ``label_maps`` are carried forward from
+    the previous latest version, so mapping one sheet of an edited file
+    keeps the other sheets queryable. Returns the workbook id.
+    """
+    if _db_conn is None:
+        return 0
+    _db_conn.begin()
+    try:
+        row = _db_conn.execute(
+            "SELECT workbook_id FROM workbooks WHERE path = ? AND is_latest",
+            (os.path.abspath(path),),
+        ).fetchone()
+        is_new = find_workbook(path, content_hash) is None
+        workbook_id = register_workbook(path, content_hash, modified)
+        if is_new and row is not None and not cataloged:
+            _carry_labels_forward(row[0], workbook_id, list(label_maps))
+        for sheet, label_map in label_maps.items():
+            store_label_map(sheet, label_map, workbook_id)
+        for sheet, sheet_blocks in (blocks or {}).items():
+            store_sheet_blocks(workbook_id, sheet, sheet_blocks)
+        if cataloged:
+            _db_conn.execute(
+                "UPDATE workbooks SET cataloged = TRUE WHERE workbook_id = ?", (workbook_id,)
+            )
+        _db_conn.commit()
+    except Exception:
+        _db_conn.rollback()
+        raise
+    return workbook_id
+
+
+@metrics.instrument("db")
+def find_workbook_version(
+    path: str, version: Optional[int] = None, exclude_hash: Optional[str] = None
+) -> Optional[Tuple[int, int]]:
+    """Return ``(workbook_id, version)`` of a snapshotted version of ``path``.
+
+    Without ``version`` the newest snapshot whose content hash differs from
+    ``exclude_hash`` is returned.
+    """
+    if _db_conn is None:
+        return None
+    row = _db_conn.execute(
+        """
+        SELECT w.workbook_id, w.version FROM workbooks w
+        WHERE w.path = ? AND (w.version = ? OR ? IS NULL)
+          AND w.content_hash IS DISTINCT FROM ?
+          AND EXISTS (SELECT 1 FROM sheet_blocks b WHERE b.workbook_id = w.workbook_id)
+        ORDER BY w.version DESC
+        LIMIT 1
+        """,
+        (os.path.abspath(path), version, version, exclude_hash),
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+@metrics.instrument("db")
+def store_sheet_blocks(workbook_id: int, sheet_name: str, blocks: List[Tuple[int, bytes, bytes]]) -> None:
+    """Replace the ``(block, digest, row_digests)`` rows stored for a sheet."""
+    if _db_conn is None:
+        return
+    _db_conn.execute(
+        "DELETE FROM sheet_blocks WHERE workbook_id = ? AND sheet_name = ?",
+        (workbook_id, sheet_name),
+    )
+    for start in range(0, len(blocks), _WRITE_CHUNK):
+        chunk = blocks[start:start + _WRITE_CHUNK]
+        _db_conn.execute(
+            """
+            INSERT INTO sheet_blocks
+            SELECT ?, ?, block, digest, row_digests
+            FROM (SELECT unnest(?) AS block, unnest(?) AS digest, unnest(?) AS row_digests)
+            """,
+            (
+                workbook_id,
+                sheet_name,
+                [b[0] for b in chunk],
+                [b[1] for b in chunk],
+                [b[2] for b in chunk],
+            ),
         )
+    metrics.count("db.rows_written", len(blocks))
+
+
+@metrics.instrument("db")
+def load_sheet_blocks(workbook_id: int) -> Dict[str, Dict[int, Tuple[bytes, bytes]]]:
+    """Return ``{sheet: {block: (digest, row_digests)}}`` for a workbook version."""
+    if _db_conn is None:
+        return {}
+    blocks: Dict[str, Dict[int, Tuple[bytes, bytes]]] = {}
+    rows = _db_conn.execute(
+        "SELECT sheet_name, block, digest, row_digests FROM sheet_blocks WHERE workbook_id = ?",
+        (workbook_id,),
+    ).fetchall()
+    for sheet, block, digest, row_digests in rows:
+        blocks.setdefault(sheet, {})[block] = (bytes(digest), bytes(row_digests))
+    return blocks
+
+
+@metrics.instrument("db")
+def load_label_maps(workbook_id: int) -> Dict[str, Dict[str, str]]:
+    """Return ``{sheet: {label: address}}`` stored for a workbook version."""
+    if _db_conn is None:
+        return {}
+    maps: Dict[str, Dict[str, str]] = {}
+    rows = _db_conn.execute(
+        "SELECT sheet_name, label, cell_address FROM cell_labels WHERE workbook_id = ?",
+        (workbook_id,),
+    ).fetchall()
+    for sheet, label, address in rows:
+        maps.setdefault(sheet, {})[label] = address
+    return maps
+
+
+def _workbook_filter(workbook: Optional[str]) -> Tuple[str, List[object]]:
+    """SQL predicate on ``workbooks w`` selecting latest versions."""
+    if workbook is None:
+        return "w.is_latest", []
+    return "w.is_latest AND w.path = ?", [os.path.abspath(workbook) if workbook else ""]
+
+
+def _index_labels(workbook_id: int, sheet_name: str, ts: float, stale_tokens: Set[str]) -> None:
+    """Tokenize the labels of ``sheet_name`` written at ``ts``.
+
+    Vocabulary counts are refreshed for the new tokens and for
+    ``stale_tokens`` of the label rows they replaced.
+    """
+    global _vocab_cache
+    _vocab_cache = None
+    _db_conn.execute(
         """
+        INSERT INTO label_tokens
+        SELECT DISTINCT token, workbook_id, label, sheet_name, cell_address, norm_label,
+               token_mask(norm_label)
+        FROM (
+            SELECT unnest(string_split(norm_label, ' ')) AS token,
+                   workbook_id, label, sheet_name, cell_address, norm_label
+            FROM cell_labels
+            WHERE workbook_id = ? AND sheet_name = ? AND last_updated = to_timestamp(?)
+        )
+        WHERE token <> ''
+        """,
+        (workbook_id, sheet_name, ts),
+    )
+    stale = sorted(stale_tokens)
+    _db_conn.execute("DELETE FROM label_vocab WHERE list_contains(?::VARCHAR[], token)", (stale,))
+    _db_conn.execute(
+        """
+        INSERT OR REPLACE INTO label_vocab
+        SELECT token, count(*) FROM label_tokens
+        WHERE list_contains(?::VARCHAR[], token) OR token IN (
+            SELECT unnest(string_split(norm_label, ' ')) FROM cell_labels
+            WHERE workbook_id = ? AND sheet_name = ? AND last_updated = to_timestamp(?)
+        )
+        GROUP BY token
+        """,
+        (stale, workbook_id, sheet_name, ts),
     )
 
 
-def store_label_map(sheet_name: str, label_map: Dict[str, str]) -> None:
+@metrics.instrument("db")
+def store_label_map(sheet_name: str, label_map: Dict[str, str], workbook_id: int = 0) -> None:
     """Insert or update label mappings in the database."""
     if _db_conn is None:
         return
     ts = time.time()
-    for label, addr in label_map.items():
+    items = list(label_map.items())
+    stale_tokens: Set[str] = set()
+    # Labels are written in chunks bound as list parameters; one statement
+    # per label costs more than a millisecond each in DuckDB.
+    for start in range(0, len(items), _WRITE_CHUNK):
+        labels = [label for label, _ in items[start:start + _WRITE_CHUNK]]
+        addrs = [addr for _, addr in items[start:start + _WRITE_CHUNK]]
         _db_conn.execute(
-            "DELETE FROM cell_labels WHERE label = ? AND sheet_name = ?",
-            (label, sheet_name),
+            """
+            DELETE FROM cell_labels
+            WHERE workbook_id = ? AND sheet_name = ? AND label IN (SELECT unnest(?))
+            """,
+            (workbook_id, sheet_name, labels),
+        )
+        stale_tokens.update(
+            r[0]
+            for r in _db_conn.execute(
+                """
+                DELETE FROM label_tokens
+                WHERE workbook_id = ? AND sheet_name = ? AND label IN (SELECT unnest(?))
+                RETURNING token
+                """,
+                (workbook_id, sheet_name, labels),
+            ).fetchall()
         )
         _db_conn.execute(
-            "INSERT INTO cell_labels VALUES (?, ?, ?, to_timestamp(?))",
-            (label, sheet_name, addr, ts),
+            """
+            INSERT INTO cell_labels
+            SELECT ?, label, ?, addr, to_timestamp(?), normalize_label(label)
+            FROM (SELECT unnest(?) AS label, unnest(?) AS addr)
+            """,
+            (workbook_id, sheet_name, ts, labels, addrs),
+        )
+    if items:
+        _index_labels(workbook_id, sheet_name, ts, stale_tokens)
+    metrics.count("db.rows_written", len(items))
+
+
+@metrics.instrument("db")
+def rebuild_label_index() -> None:
+    """Rebuild the label search index from ``cell_labels``.
+
+    Token rows are rewritten in token order so DuckDB's zone maps can skip
+    row groups during lookups, shortest labels first within a token; run
+    this after bulk loads.
+    """
+    global _vocab_cache
+    if _db_conn is None:
+        return
+    _vocab_cache = None
+    # Rebuilding the index afterwards is faster than updating it per row.
+    _db_conn.execute("DROP INDEX IF EXISTS cell_labels_norm")
+    _db_conn.execute("UPDATE cell_labels SET norm_label = normalize_label(label)")
+    _db_conn.execute(_NORM_LABEL_INDEX)
+    _db_conn.execute(
+        """
+        CREATE OR REPLACE TABLE label_tokens AS
+        SELECT DISTINCT token, workbook_id, label, sheet_name, cell_address, norm_label,
+               token_mask(norm_label) AS token_mask
+        FROM (
+            SELECT unnest(string_split(norm_label, ' ')) AS token,
+                   workbook_id, label, sheet_name, cell_address, norm_label
+            FROM cell_labels
         )
+        WHERE token <> ''
+        ORDER BY token, length(norm_label)
+        """
+    )
+    _db_conn.execute("DELETE FROM label_vocab")
+    _db_conn.execute(
+        "INSERT INTO label_vocab SELECT token, count(*) FROM label_tokens GROUP BY token"
+    )
+
 
+@metrics.instrument("db")
+def query_label(label: str, workbook: Optional[str] = None) -> List[Tuple[str, str, str]]:
+    """Return list of (workbook_path, sheet_name, cell_address) for a label.
 
-def query_label(label: str) -> List[Tuple[str, str]]:
-    """Return list of (sheet_name, cell_address) for a label."""
+    Only the latest version of each workbook is searched; ``workbook``
+    restricts results to a single workbook path.
+    """
     if _db_conn is None:
         return []
+    predicate, params = _workbook_filter(workbook)
+    rows = _db_conn.execute(
+        f"""
+        SELECT w.path, c.sheet_name, c.cell_address
+        FROM cell_labels c JOIN workbooks w USING (workbook_id)
+        WHERE c.label = ? AND {predicate}
+        ORDER BY w.path, c.sheet_name
+        """,
+        [label] + params,
+    ).fetchall()
+    return [(r[0], r[1], r[2]) for r in rows]
+
+
+@metrics.instrument("db")
+def query_labels(labels: List[str], workbook: Optional[str] = None) -> List[Tuple[str, str, str, str]]:
+    """Return ``(label, workbook_path, sheet_name, cell_address)`` for many labels.
+
+    Only the latest versions are searched: those of ``workbook``, if
+    given, and mappings whose source workbook is unknown (path ``""``).
+    """
+    if _db_conn is None or not labels:
+        return []
+    # Labels are bound as one NUL-separated string: DuckDB converts list
+    # parameters element by element, which costs more than the lookup.
+    # Cell text never contains NUL.
     rows = _db_conn.execute(
-        "SELECT sheet_name, cell_address FROM cell_labels WHERE label = ?",
-        (label,),
+        """
+        SELECT c.label, w.path, c.sheet_name, c.cell_address
+        FROM cell_labels c JOIN workbooks w USING (workbook_id)
+        WHERE w.is_latest AND w.path IN (?, '')
+          AND c.label IN (SELECT unnest(string_split(?, chr(0))))
+        ORDER BY c.label, w.path, c.sheet_name
+        """,
+        (os.path.abspath(workbook) if workbook else "", "\0".join(labels)),
     ).fetchall()
-    return [(r[0], r[1]) for r in rows]
+    return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+
+def _load_vocab() -> Tuple[List[str], Dict[str, int]]:
+    """Return the cached ``(sorted_tokens, doc_counts)`` label vocabulary."""
+    global _vocab_cache
+    if _vocab_cache is None:
+        rows = _db_conn.execute("SELECT token, doc_count FROM label_vocab ORDER BY token").fetchall()
+        _vocab_cache = ([r[0] for r in rows], {r[0]: r[1] for r in rows})
+    return _vocab_cache
+
+
+def normalize_label(label: str) -> str:
+    """Fold case and punctuation exactly like the ``normalize_label`` macro."""
+    return _NON_ALNUM.sub(" ", label.lower()).strip()
+
+
+def _expand_token(token: str) -> Dict[str, float]:
+    """Map vocabulary tokens matching ``token`` to a match weight.
+
+    Exact matches weigh 1.0 and prefix matches 0.8. Fuzzy matches share the
+    first character, differ in length by at most two and are scaled from
+    their similarity ratio.
+    """
+    tokens, _ = _load_vocab()
+    expanded: Dict[str, float] = {}
+    pos = bisect_left(tokens, token)
+    for vocab_token in tokens[pos:pos + _PREFIX_EXPANSIONS]:
+        if not vocab_token.startswith(token):
+            break
+        expanded[vocab_token] = 1.0 if vocab_token == token else 0.8
+
+    lo = bisect_left(tokens, token[0])
+    hi = bisect_left(tokens, chr(ord(token[0]) + 1))
+    fuzzy: List[Tuple[float, str]] = []
+    matcher = SequenceMatcher(b=token, autojunk=False)
+    for vocab_token in tokens[lo:hi]:
+        if vocab_token in expanded or abs(len(vocab_token) - len(token)) > 2:
+            continue
+        matcher.set_seq1(vocab_token)
+        if matcher.quick_ratio() < _FUZZY_THRESHOLD:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= _FUZZY_THRESHOLD:
+            fuzzy.append((ratio, vocab_token))
+    for ratio, vocab_token in sorted(fuzzy, reverse=True)[:_FUZZY_EXPANSIONS]:
+        expanded[vocab_token] = 0.6 * ratio
+    return expanded
+
+
+def _token_bit(token: str) -> int:
+    """Bit of ``token`` in label masks, like the ``token_bit`` macro."""
+    second = ord(token[1]) if len(token) > 1 else 0
+    return (len(token) * 7 + ord(token[0]) * 3 + second * 11 + ord(token[-1]) * 5) % 64
+
+
+def _pivot_rows(
+    pivot_token: str, pivot_exp: Dict[str, float], where: str, limit: int
+) -> List[Tuple[int, str, str, str, str]]:
+    """Return up to ``limit`` label rows matching ``pivot_exp`` and ``where``.
+
+    One range scan covers the exact and prefix matches of the pivot token,
+    one equality scan each of its fuzzy matches; scans run in that order
+    until ``limit`` rows are found.
+    """
+    branches = [f"token >= '{pivot_token}' AND token < '{pivot_token}' || chr(1114111)"]
+    branches += [f"token = '{t}'" for t in pivot_exp if not t.startswith(pivot_token)]
+    rows: List[Tuple[int, str, str, str, str]] = []
+    for branch in branches:
+        if len(rows) >= limit:
+            break
+        rows += _db_conn.execute(
+            "SELECT workbook_id, label, sheet_name, cell_address, norm_label FROM label_tokens "
+            f"WHERE {branch} AND {where} LIMIT {limit - len(rows)}"
+        ).fetchall()
+    return rows
+
+
+@metrics.instrument("db")
+def search_labels(
+    query: str, limit: int = 10, workbook: Optional[str] = None
+) -> List[Tuple[str, str, str, str, float]]:
+    """Return ranked ``(label, workbook_path, sheet_name, cell_address, score)``.
+
+    The query is normalized like stored labels and every query token is
+    matched exactly, as a prefix or fuzzily against the token vocabulary.
+    Candidates are drawn from the most selective query token and ranked by
+    how well they cover all query tokens. Only the latest version of each
+    workbook is searched; ``workbook`` restricts results to one path.
+    """
+    if _db_conn is None:
+        return []
+    norm_query = normalize_label(query)
+    q_tokens = list(dict.fromkeys(t for t in norm_query.split(" ") if t))
+    if not q_tokens:
+        return []
+
+    expansions = [_expand_token(t) for t in q_tokens]
+    _, counts = _load_vocab()
+    usable = [(q_tokens[i], exp) for i, exp in enumerate(expansions) if exp]
+    if not usable:
+        return []
+    pivot_token, pivot_exp = min(usable, key=lambda item: sum(counts[t] for t in item[1]))
+    masks = [
+        sum(1 << b for b in {_token_bit(t) for t in exp})
+        for t, exp in zip(q_tokens, expansions)
+        if exp and t != pivot_token
+    ]
+    predicate, filter_params = _workbook_filter(workbook)
+    paths = dict(
+        _db_conn.execute(
+            f"SELECT workbook_id, path FROM workbooks w WHERE {predicate}", filter_params
+        ).fetchall()
+    )
+    if not paths:
+        return []
+    # Normalized text is plain ``[a-z0-9 ]`` and inlined like the ids:
+    # DuckDB skips row groups by zone map and uses the ``norm_label`` index
+    # for constant filters only, and binding parameters costs about as much
+    # as the scans below.
+    in_workbooks = f"workbook_id IN ({', '.join(str(i) for i in paths)})"
+
+    # Exact labels are looked up on their own so a common token can never
+    # push them past the candidate limit.
+    candidates = _db_conn.execute(
+        "SELECT workbook_id, label, sheet_name, cell_address, norm_label FROM cell_labels "
+        f"WHERE norm_label = '{norm_query}' AND {in_workbooks} LIMIT {_SEARCH_CANDIDATES}"
+    ).fetchall()
+    # Then labels matching the pivot token and, by their token masks, all
+    # other query tokens, only some of them, or none. Each tier is a bounded
+    # scan of pivot rows, which come shortest label first. Masks can
+    # collide, so they only order the scans; scores below use the tokens.
+    tiers = ["TRUE"]
+    if masks:
+        all_others = " AND ".join(f"token_mask & {m} <> 0" for m in masks)
+        any_other = " OR ".join(f"token_mask & {m} <> 0" for m in masks)
+        tiers = [all_others, f"({any_other}) AND NOT ({all_others})", f"NOT ({any_other})"]
+        if len(masks) == 1:
+            del tiers[1]
+    for tier in tiers:
+        if len(candidates) >= _SEARCH_CANDIDATES:
+            break
+        candidates += _pivot_rows(
+            pivot_token, pivot_exp, f"({tier}) AND {in_workbooks}", _SEARCH_CANDIDATES - len(candidates)
+        )
+
+    ranked: Dict[Tuple[int, str, str], Tuple[str, str, str, str, float]] = {}
+    for workbook_id, label, sheet, addr, norm_label in candidates:
+        if (workbook_id, label, sheet) in ranked:
+            continue
+        l_tokens = norm_label.split(" ")
+        score = 0.0
+        for exp in expansions:
+            score += max((exp[t] for t in l_tokens if t in exp), default=0.0)
+        score /= len(q_tokens)
+        if norm_label == norm_query:
+            score += 0.5
+        # Prefer tighter labels when coverage ties.
+        score -= 0.01 * max(len(l_tokens) - len(q_tokens), 0)
+        ranked[(workbook_id, label, sheet)] = (
+            label, paths[workbook_id], sheet, addr, round(score, 4)
+        )
+
+    results = sorted(ranked.values(), key=lambda r: (-r[4], r[0], r[1], r[2]))
+    return results[:limit]
@@ -0,0 +1,942 @@
+# Structural diff of workbook versions streamed from their XML parts
+import hashlib
+import posixpath
+import re
+import struct
+import zipfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from html import unescape
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple, Union
+from xml.etree import ElementTree
+
+# Rows per hashed block; matching block digests skip all of their rows.
+BLOCK_ROWS = 64
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_DOC_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_SHEET_DATA = re.compile(rb"<(\w+:)?sheetData\b")
+_ROW_NUMBER = re.compile(rb'\br="(\d+)"')
+# One match per cell: column letters, type, formula attributes, formula
+# element (empty when absent), formula text, cached value, inline string.
+# ``_CELL_FAST`` covers the attribute order Excel and openpyxl write and
+# ``_CELL`` any other layout.
+_CELL_FAST = re.compile(
+    rb'<c r="([A-Z]+)\d+"(?: s="\d+")?(?: t="(\w+)")?(?: \w+="[^"]*")*'
+    rb"(?:/>|>(?:<f([^>]*)(/>|>([^<]*)</f>))?(?:<v>([^<]*)</v>|<v ?/>)?(?:<is>(.*?)</is>)?</c>)",
+    re.S,
+)
+_CELL = re.compile(
+    rb"<(?:\w+:)?c\b(?=(?:[^>]*?\br=\"([A-Z]+))?)(?=(?:[^>]*?\bt=\"(\w+))?)[^>]*?"
+    rb"(?:/>|>"
+    rb"(?:<(?:\w+:)?f\b([^>]*?)(/>|>([^<]*)</(?:\w+:)?f>))?"
+    rb"(?:<(?:\w+:)?v>([^<]*)</(?:\w+:)?v>|<(?:\w+:)?v\s*/>)?"
+    rb"(?:<(?:\w+:)?is>(.*?)</(?:\w+:)?is>)?"
+    rb"(?:<(?:\w+:)?extLst>.*?</(?:\w+:)?extLst>)?"
+    rb"</(?:\w+:)?c>)",
+    re.S,
+)
+# Formula cells and plain text cells alone, matched across many rows at
+# once when every cell carries an unprefixed reference; numbers are only
+# ever hashed.
+_FORMULA_FAST = re.compile(rb'<c r="([A-Z]+)(\d+)"[^>]*><f([^>]*)(?:/>|>([^<]*)</f>)')
+_LABEL_FAST = re.compile(
+    rb'<c r="([A-Z]+)(\d+)"(?: s="\d+")? t="(s|inlineStr|str)"(?: \w+="[^"]*")*>'
+    rb"(?:<v>([^<]*)</v>|<is>(.*?)</is>)</c>",
+    re.S,
+)
+_SHARED_INDEX = re.compile(rb'\bsi="(\d+)"')
+_TEXT = re.compile(rb"<(?:\w+:)?t\b[^>]*>(.*?)</(?:\w+:)?t>", re.S)
+# Row digests ignore cell styles and see shared strings by content rather
+# than by their index, which shifts whenever a string is added.
+_STYLE = re.compile(rb' s="\d+"')
+_STRING_VALUE = re.compile(rb'(\bt="s"[^>]*>)<((?:\w+:)?v)>(\d+)</')
+
+# Cell and range references inside formula text. Quoted strings are blanked
+# out before matching; names followed by ``(`` are functions, not cells.
+_REF = re.compile(
+    r"(?<![\w.$'\]])"
+    r"(?:(?:'(?P<qsheet>(?:[^']|'')+)'|(?P<sheet>[A-Za-z_][\w.]*))!)?"
+    r"(?:(?P<c1>\$?[A-Z]{1,3})(?P<r1>\$?\d+)(?::(?P<c2>\$?[A-Z]{1,3})(?P<r2>\$?\d+))?"
+    r"|(?P<cc1>\$?[A-Z]{1,3}):(?P<cc2>\$?[A-Z]{1,3}))"
+    r"(?![\w(.!])"
+)
+_STRING = re.compile(r'"(?:[^"]|"")*"')
+# Identifiers that may be workbook-level defined names; sheet prefixes,
+# functions and structured table references are excluded.
+_NAME = re.compile(r"(?<![\w.$'\[\]!\\])([A-Za-z_\\][\w.\\]*)(?![\w(!\[\\])")
+# Address-like tokens of formula texts joined with NUL separators.
+_TOKEN = re.compile(rb"\x00|\$?[A-Z]{1,3}\$?\d+")
+
+_MAX_ROW = 1048576
+_ROW_ENTRY = struct.Struct(">B8s")
+_TEXT_KINDS = (b"s", b"inlineStr", b"str")
+_NUMBER_KINDS = (b"", b"n", b"b")
+
+# A formula is its text, or ``(master_text, row_offset, col_offset)`` for a
+# shared-formula child whose text is derived from the group's master cell.
+Formula = Union[str, Tuple[str, int, int]]
+Cells = Dict[int, Tuple[Any, Optional[Formula]]]
+Ref = Tuple[Optional[str], int, int, int, int, int]
+# Raw cell fields as matched by ``_CELL``; see :meth:`XlsxPackage.cells`.
+RawCell = Tuple[bytes, bytes, bytes, bytes, bytes, bytes, bytes]
+RawRow = Tuple[int, bytes, Optional[Dict[int, Formula]]]
+
+_COLUMNS: Dict[Union[str, bytes], int] = {}
+_NEXT_COLUMN: Dict[bytes, bytes] = {}
+
+
+def _column_index(letters: Union[str, bytes]) -> int:
+    idx = _COLUMNS.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters.decode() if isinstance(letters, bytes) else letters:
+            idx = idx * 26 + (ord(ch) - 64)
+        _COLUMNS[letters] = idx
+    return idx
+
+
+def _column_letters(col: int) -> str:
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _next_column(letters: bytes) -> bytes:
+    following = _NEXT_COLUMN.get(letters)
+    if following is None:
+        following = _NEXT_COLUMN[letters] = _column_letters(_column_index(letters) + 1).encode()
+    return following
+
+
+def _text(raw: bytes) -> str:
+    return unescape(raw.decode()) if b"&" in raw else raw.decode()
+
+
+def _parse_refs(formula: str) -> List[Ref]:
+    """Return ``(sheet, r1, c1, r2, c2, absolute_mask)`` for each reference.
+
+    Bits 1, 2, 4 and 8 of the mask flag absolute ``r1``, ``c1``, ``r2`` and
+    ``c2`` so shared formulas can shift only the relative parts.
+    """
+    refs: List[Ref] = []
+    if '"' in formula:
+        formula = _STRING.sub(lambda m: " " * len(m.group(0)), formula)
+    for qsheet, sheet, c1, r1, c2, r2, cc1, cc2 in _REF.findall(formula):
+        if qsheet:
+            sheet = qsheet.replace("''", "'")
+        if c1:
+            if not c2:
+                c2, r2 = c1, r1
+        else:
+            c1, c2 = cc1, cc2
+            r1, r2 = "$1", f"${_MAX_ROW}"
+        mask = (r1[0] == "$") | (c1[0] == "$") << 1 | (r2[0] == "$") << 2 | (c2[0] == "$") << 3
+        refs.append((
+            sheet or None,
+            int(r1.lstrip("$")), _column_index(c1.lstrip("$")),
+            int(r2.lstrip("$")), _column_index(c2.lstrip("$")),
+            mask,
+        ))
+    return refs
+
+
+def _shift_refs(refs: List[Ref], dr: int, dc: int) -> List[Ref]:
+    return [
+        (
+            sheet,
+            r1 if mask & 1 else r1 + dr, c1 if mask & 2 else c1 + dc,
+            r2 if mask & 4 else r2 + dr, c2 if mask & 8 else c2 + dc,
+            mask,
+        )
+        for sheet, r1, c1, r2, c2, mask in refs
+    ]
+
+
+def translate_formula(formula: str, dr: int, dc: int) -> str:
+    """Shift the relative references of ``formula`` by ``dr`` rows and ``dc`` columns."""
+    if not dr and not dc:
+        return formula
+    masked = _STRING.sub(lambda m: " " * len(m.group(0)), formula)
+
+    def shift_cell(col: str, row: str) -> str:
+        if col[0] != "$":
+            col = _column_letters(_column_index(col) + dc)
+        if row[0] != "$":
+            row = str(int(row) + dr)
+        return col + row
+
+    def shift_column(col: str) -> str:
+        return col if col[0] == "$" else _column_letters(_column_index(col) + dc)
+
+    parts: List[str] = []
+    last = 0
+    for m in _REF.finditer(masked):
+        start = m.start("c1") if m.group("c1") else m.start("cc1")
+        parts.append(formula[last:start])
+        if m.group("c1"):
+            text = shift_cell(m.group("c1"), m.group("r1"))
+            if m.group("c2"):
+                text += ":" + shift_cell(m.group("c2"), m.group("r2"))
+        else:
+            text = shift_column(m.group("cc1")) + ":" + shift_column(m.group("cc2"))
+        parts.append(text)
+        last = m.end()
+    parts.append(formula[last:])
+    return "".join(parts)
+
+
+def formula_text(formula: Optional[Formula]) -> Optional[str]:
+    """Return the display text of a stored formula."""
+    if formula is None or isinstance(formula, str):
+        return formula
+    return translate_formula(*formula)
+
+
+def _is_target(cell: RawCell) -> bool:
+    """Whether a raw cell holds a formula or a number, i.e. can carry a label."""
+    return bool(cell[3]) or (cell[1] in _NUMBER_KINDS and cell[5] != b"")
+
+
+class XlsxPackage:
+    """Read worksheet rows directly from the parts of an ``.xlsx`` file.
+
+    The worksheet XML is streamed in chunks and cut into rows without an
+    XML parser. Formula and text cells are matched across a whole chunk,
+    other cells are only decoded for rows that differ, so unchanged rows
+    cost little more than a hash of their bytes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._strings: Optional[List[str]] = None
+        root_rels = self._relationships("_rels/.rels", "")
+        workbook_part = next(
+            target for rel_type, target in root_rels.values() if rel_type.endswith("/officeDocument")
+        )
+        base = posixpath.dirname(workbook_part)
+        rels = self._relationships(
+            posixpath.join(base, "_rels", posixpath.basename(workbook_part) + ".rels"), base
+        )
+        workbook = ElementTree.fromstring(self._zip.read(workbook_part))
+        self.sheets: Dict[str, str] = {}
+        for sheet in workbook.iter(f"{_MAIN}sheet"):
+            rel_type, target = rels.get(sheet.get(f"{_DOC_REL}id"), ("", ""))
+            if rel_type.endswith("/worksheet"):
+                self.sheets[sheet.get("name")] = target
+        self._shared_strings_part = next(
+            (target for rel_type, target in rels.values() if rel_type.endswith("/sharedStrings")), None
+        )
+        self.defined_names: List[Tuple[str, str, str]] = []
+        # References of each workbook-level name by lowercase name, all
+        # flagged absolute: shared formulas never shift a name's target.
+        self.name_refs: Dict[str, List[Ref]] = {}
+        for defined in workbook.iter(f"{_MAIN}definedName"):
+            name = defined.get("name", "")
+            if defined.get("localSheetId") is not None or name.startswith("_xlnm."):
+                continue
+            refs = [ref for ref in _parse_refs(defined.text or "") if ref[0] in self.sheets]
+            if refs:
+                sheet, row, col = refs[0][0], refs[0][1], refs[0][2]
+                self.defined_names.append((name, sheet, f"{_column_letters(col)}{row}"))
+                self.name_refs[name.lower()] = [ref[:5] + (15,) for ref in refs]
+
+    def _relationships(self, part: str, base: str) -> Dict[str, Tuple[str, str]]:
+        try:
+            root = ElementTree.fromstring(self._zip.read(part))
+        except KeyError:
+            return {}
+        rels = {}
+        for rel in root.iter(f"{_PKG_REL}Relationship"):
+            target = rel.get("Target", "")
+            target = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+            rels[rel.get("Id")] = (rel.get("Type", ""), target)
+        return rels
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self) -> "XlsxPackage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def shared_strings(self) -> List[str]:
+        if self._strings is None:
+            strings: List[str] = []
+            if self._shared_strings_part:
+                with self._zip.open(self._shared_strings_part) as fh:
+                    for _, elem in ElementTree.iterparse(fh):
+                        if elem.tag != f"{_MAIN}si":
+                            continue
+                        parts = [elem.findtext(f"{_MAIN}t") or ""]
+                        parts.extend(r.findtext(f"{_MAIN}t") or "" for r in elem.iterfind(f"{_MAIN}r"))
+                        strings.append("".join(parts))
+                        elem.clear()
+            self._strings = strings
+        return self._strings
+
+    def regions(self, sheet: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[bytes, List[Tuple[int, bytes]], bool]]:
+        """Yield runs of complete rows as ``(xml, [(row, body_xml)], unprefixed)``.
+
+        Each run covers about ``chunk_size`` bytes of the worksheet part;
+        ``unprefixed`` is false when the sheet uses a namespace prefix.
+        """
+        with self._zip.open(self.sheets[sheet]) as fh:
+            buffer = fh.read(chunk_size)
+            m = _SHEET_DATA.search(buffer)
+            prefix = m.group(1) or b"" if m else b""
+            open_tag, close_tag = b"<" + prefix + b"row", b"</" + prefix + b"row>"
+            row = 0
+            chunk = buffer
+            while True:
+                cut = buffer.rfind(close_tag)
+                if cut >= 0:
+                    cut += len(close_tag)
+                    region, buffer = buffer[:cut], buffer[cut:]
+                    rows = []
+                    for part in region.split(close_tag)[:-1]:
+                        start = part.rfind(open_tag)
+                        end = part.index(b">", start)
+                        r = _ROW_NUMBER.search(part, start, end)
+                        row = int(r.group(1)) if r else row + 1
+                        rows.append((row, part[end + 1:]))
+                    yield region, rows, not prefix
+                if not chunk:
+                    return
+                chunk = fh.read(chunk_size)
+                buffer += chunk
+
+    @staticmethod
+    def cells(body: bytes) -> List[RawCell]:
+        """Return the raw ``(letters, type, f_attrs, f_element, f_text, value, inline)`` cells.
+
+        ``f_element`` is empty for cells without a formula. Cells written
+        without a reference get the letters of the column after the previous
+        cell.
+        """
+        cells = _CELL_FAST.findall(body)
+        if len(cells) == body.count(b"<c"):
+            return cells
+        cells = _CELL.findall(body)
+        letters = b""
+        for i, cell in enumerate(cells):
+            if cell[0]:
+                letters = cell[0]
+            else:
+                letters = _next_column(letters) if letters else b"A"
+                cells[i] = (letters,) + cell[1:]
+        return cells
+
+    def value(self, cell: RawCell) -> Any:
+        """Decode the cached value of a raw cell."""
+        _, kind, _, f_element, _, raw, inline = cell
+        if kind == b"" or kind == b"n":
+            if raw:
+                return float(raw) if b"." in raw or b"E" in raw or b"e" in raw else int(raw)
+            return None
+        if kind == b"s":
+            return self.shared_strings()[int(raw)] if raw else None
+        if kind == b"inlineStr":
+            runs = _TEXT.findall(inline)
+            return _text(runs[0]) if len(runs) == 1 else "".join(map(_text, runs))
+        if kind == b"b":
+            return raw == b"1" if raw else None
+        if raw or kind == b"str" and f_element:
+            return _text(raw)
+        return None
+
+    def decode(self, raw_row: RawRow) -> Cells:
+        """Return ``{col: (value, formula)}`` of the non-empty cells of a raw row."""
+        _, body, shared = raw_row
+        decoded: Cells = {}
+        for cell in self.cells(body):
+            col = _column_index(cell[0])
+            formula: Optional[Formula] = None
+            if cell[3]:
+                if shared and col in shared:
+                    formula = shared[col]
+                elif cell[4]:
+                    formula = "=" + _text(cell[4])
+            value = self.value(cell)
+            if value is None and formula is None:
+                continue
+            decoded[col] = (value, formula)
+        return decoded
+
+    def row_digest(self, body: bytes, shared: Optional[Dict[int, Formula]]) -> bytes:
+        """Return an 8 byte digest of a row independent of styles and string indices."""
+        if b' s="' in body:
+            body = _STYLE.sub(b"", body)
+        if b't="s"' in body:
+            strings = self.shared_strings()
+
+            def resolve(m: "re.Match[bytes]") -> bytes:
+                text = strings[int(m.group(3))].encode()
+                return b"%s<%s:%d>%s</" % (m.group(1), m.group(2), len(text), text)
+
+            body = _STRING_VALUE.sub(resolve, body)
+        digest = hashlib.blake2b(body, digest_size=8)
+        if shared:
+            # Children of shared formulas only carry the group index.
+            digest.update(repr(sorted(shared.items())).encode())
+        return digest.digest()
+
+
+_COL_BITS = 15
+_COL_MASK = (1 << _COL_BITS) - 1
+_ROW_MASK = (1 << 21) - 1
+_SHEET_SHIFT = _COL_BITS + 21
+
+
+class _Graph:
+    """Reverse formula dependencies of one workbook.
+
+    Cells are packed into ``sheet << 36 | row << 15 | col`` keys; columns
+    need 15 bits (XFD is 16384) and rows 21 bits. Formulas
+    with ranges and shared-formula children are parsed as they are added
+    into typed arrays: single cell edges sorted for binary search and range
+    edges bucketed by column when narrow. All other formula texts are only
+    appended to a byte buffer and parsed when a token index over them
+    names them as a candidate dependent of a changed cell. Defined names
+    in ``names`` are resolved as formulas are added and linked like the
+    references they stand for.
+    """
+
+    _WIDE = 16
+
+    def __init__(self, sheet_names: List[str], names: Optional[Dict[str, List[Ref]]] = None):
+        self.sheet_ids = {name.lower(): i for i, name in enumerate(sheet_names)}
+        self.sheet_names = sheet_names
+        self.names = names or {}
+        self.src = array("q")
+        self.dst = array("q")
+        self.ranges = array("q")  # sheet, r1, c1, r2, c2, dst per range
+        self._columns: Dict[int, List[int]] = {}
+        self._wide: List[int] = []
+        self._shared_refs: Dict[Tuple[int, str], List[Ref]] = {}
+        self._texts = bytearray()
+        self._text_keys = array("q")
+
+    @staticmethod
+    def key(sheet: int, row: int, col: int) -> int:
+        return sheet << _SHEET_SHIFT | row << _COL_BITS | col
+
+    @staticmethod
+    def split(key: int) -> Tuple[int, int, int]:
+        return key >> _SHEET_SHIFT, (key >> _COL_BITS) & _ROW_MASK, key & _COL_MASK
+
+    def address(self, key: int) -> str:
+        sheet, row, col = self.split(key)
+        return f"{self.sheet_names[sheet]}!{_column_letters(col)}{row}"
+
+    def _named_refs(self, formula: str) -> List[Ref]:
+        if '"' in formula:
+            formula = _STRING.sub(lambda m: " " * len(m.group(0)), formula)
+        refs: List[Ref] = []
+        for name in _NAME.findall(formula):
+            refs += self.names.get(name.lower(), ())
+        return refs
+
+    def add_text(self, sheet: int, row: int, col: int, text: bytes) -> None:
+        """Add a formula from its raw XML text."""
+        key = self.key(sheet, row, col)
+        if self.names:
+            self._add_refs(sheet, key, self._named_refs(_text(text)))
+        if b":" in text:
+            self._add_refs(sheet, key, _parse_refs(_text(text)))
+        else:
+            self._texts += b"\x00"
+            self._texts += text
+            self._text_keys.append(key)
+
+    def add_shared(self, sheet: int, row: int, col: int, formula: Formula) -> None:
+        """Add a shared formula master (text) or child (``(master, dr, dc)``)."""
+        master, dr, dc = (formula, 0, 0) if isinstance(formula, str) else formula
+        refs = self._shared_refs.get((sheet, master))
+        if refs is None:
+            refs = _parse_refs(master)
+            if self.names:
+                refs += self._named_refs(master)
+            self._shared_refs[(sheet, master)] = refs
+        self._add_refs(sheet, self.key(sheet, row, col), _shift_refs(refs, dr, dc))
+
+    def _resolve(self, sheet: int, ref_sheet: Optional[str]) -> Optional[int]:
+        return sheet if ref_sheet is None else self.sheet_ids.get(ref_sheet.lower())
+
+    def _add_refs(self, sheet: int, dst: int, refs: List[Ref]) -> None:
+        for ref_sheet, r1, c1, r2, c2, _ in refs:
+            target = self._resolve(sheet, ref_sheet)
+            if target is None or r1 < 1 or c1 < 1:
+                continue
+            if r1 == r2 and c1 == c2:
+                self.src.append(self.key(target, r1, c1))
+                self.dst.append(dst)
+            else:
+                idx = len(self.ranges) // 6
+                self.ranges.extend((target, r1, c1, r2, c2, dst))
+                if c2 - c1 < self._WIDE:
+                    for c in range(c1, c2 + 1):
+                        self._columns.setdefault(target << _COL_BITS | c, []).append(idx)
+                else:
+                    self._wide.append(idx)
+
+    def _token_index(self) -> Dict[bytes, List[int]]:
+        index: Dict[bytes, List[int]] = {}
+        formula = -1
+        for token in _TOKEN.findall(self._texts):
+            if token == b"\x00":
+                formula += 1
+                continue
+            if b"$" in token:
+                token = token.replace(b"$", b"")
+            index.setdefault(token, []).append(formula)
+        return index
+
+    def dependents(self, changed: List[int], limit: int) -> Tuple[List[int], bool]:
+        """Return cells depending on ``changed`` (transitively) and a truncation flag."""
+        order = sorted(range(len(self.src)), key=self.src.__getitem__)
+        src = array("q", (self.src[i] for i in order))
+        dst = array("q", (self.dst[i] for i in order))
+        tokens = self._token_index() if changed and self._texts else {}
+        texts: List[bytes] = []
+        parsed: Dict[int, List[Ref]] = {}
+        seen: Set[int] = set(changed)
+        queue: Deque[int] = deque(changed)
+        found: List[int] = []
+        ranges = self.ranges
+        while queue:
+            key = queue.popleft()
+            sheet, row, col = self.split(key)
+            lo = bisect_left(src, key)
+            targets = list(dst[lo:bisect_right(src, key, lo)])
+            for idx in self._columns.get(sheet << _COL_BITS | col, ()):
+                base = idx * 6
+                if ranges[base + 1] <= row <= ranges[base + 3]:
+                    targets.append(ranges[base + 5])
+            for idx in self._wide:
+                base = idx * 6
+                if (ranges[base] == sheet and ranges[base + 1] <= row <= ranges[base + 3]
+                        and ranges[base + 2] <= col <= ranges[base + 4]):
+                    targets.append(ranges[base + 5])
+            for idx in tokens.get(f"{_column_letters(col)}{row}".encode(), ()):
+                if not texts:
+                    texts = self._texts.split(b"\x00")[1:]
+                refs = parsed.get(idx)
+                if refs is None:
+                    refs = parsed[idx] = _parse_refs(_text(texts[idx]))
+                dependent = self._text_keys[idx]
+                if any(
+                    r1 == row and c1 == col and self._resolve(dependent >> _SHEET_SHIFT, ref_sheet) == sheet
+                    for ref_sheet, r1, c1, _, _, _ in refs
+                ):
+                    targets.append(dependent)
+            for target in targets:
+                if target not in seen:
+                    if len(found) >= limit:
+                        return found, True
+                    seen.add(target)
+                    found.append(target)
+                    queue.append(target)
+        return found, False
+
+
+class _Block:
+    __slots__ = ("index", "digest", "rows", "entries")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.rows: List[RawRow] = []
+        self.entries: List[bytes] = []
+        self.digest = b""
+
+    def row_digests(self) -> Dict[int, bytes]:
+        """Return ``{row: digest}`` decoded from the packed row entries."""
+        return _unpack_entries(self.index, b"".join(self.entries))
+
+
+def _unpack_entries(index: int, entries: bytes) -> Dict[int, bytes]:
+    base = index * BLOCK_ROWS + 1
+    return {base + offset: digest for offset, digest in _ROW_ENTRY.iter_unpack(entries)}
+
+
+Texts = List[Tuple[bytes, Any, bool]]
+
+
+class _SheetScan:
+    """Stream one sheet into digested blocks, collecting labels and formulas.
+
+    Labels follow the right-then-below heuristic of the offline scanner:
+    a text cell maps to the number or formula right of it, else below it.
+    """
+
+    def __init__(self, package: XlsxPackage, sheet: str, graph: Optional[_Graph] = None, keep_rows: bool = True):
+        self.package = package
+        self.sheet = sheet
+        self.graph = graph
+        self.keep_rows = keep_rows
+        self.labels: Dict[str, str] = {}
+        self.sheet_id = graph.sheet_ids[sheet.lower()] if graph is not None else 0
+        self._masters: Dict[bytes, Tuple[str, int, int]] = {}
+
+    def _text_cells(self, body: bytes) -> Texts:
+        """Return ``(letters, value, right_is_target)`` of the plain text cells of a row."""
+        cells = self.package.cells(body)
+        last = len(cells) - 1
+        found = []
+        for i, cell in enumerate(cells):
+            if cell[1] in _TEXT_KINDS and not cell[3]:
+                right = i < last and cells[i + 1][0] == _next_column(cell[0]) and _is_target(cells[i + 1])
+                found.append((cell[0], self.package.value(cell), right))
+        return found
+
+    def _label_row(self, row: int, texts: Texts, below: Optional[Tuple[int, bytes]]) -> None:
+        for letters, value, right in texts:
+            label = value.strip() if isinstance(value, str) else ""
+            if not label or label in self.labels:
+                continue
+            if right:
+                self.labels[label] = f"{self.sheet}!{_next_column(letters).decode()}{row}"
+            elif below is not None and below[0] == row + 1 and any(
+                cell[0] == letters and _is_target(cell) for cell in self.package.cells(below[1])
+            ):
+                self.labels[label] = f"{self.sheet}!{letters.decode()}{row + 1}"
+
+    def _region_labels(self, region: bytes, last_row: int) -> Texts:
+        """Collect labels of all but the last row of a run; return the last row's text cells."""
+        strings, labels = self.package.shared_strings(), self.labels
+        carry: Texts = []
+        for m in _LABEL_FAST.finditer(region):
+            letters, digits, kind, raw, inline = m.groups()
+            if kind == b"s":
+                value = strings[int(raw)] if raw else ""
+            elif kind == b"inlineStr":
+                runs = _TEXT.findall(inline)
+                value = _text(runs[0]) if len(runs) == 1 else "".join(map(_text, runs))
+            else:
+                value = _text(raw or b"")
+            row = int(digits)
+            if row != last_row:
+                label = value.strip()
+                if not label or label in labels:
+                    continue
+            right = _CELL_FAST.match(region, m.end())
+            right = right is not None and right.group(1) == _next_column(letters) and _is_target(right.groups())
+            if row == last_row:
+                carry.append((letters, value, right))
+            elif right:
+                labels[label] = f"{self.sheet}!{_next_column(letters).decode()}{row}"
+            else:
+                end = region.find(b"</row>", m.end())
+                below = region.find(b'<c r="%s%d"' % (letters, row + 1), end, region.find(b"</row>", end + 6))
+                cell = _CELL_FAST.match(region, below) if below >= 0 else None
+                if cell is not None and _is_target(cell.groups()):
+                    labels[label] = f"{self.sheet}!{letters.decode()}{row + 1}"
+        return carry
+
+    def _formulas(self, formulas: List[Tuple[bytes, bytes, bytes, bytes]]) -> Dict[int, Dict[int, Formula]]:
+        """Feed ``(letters, row, f_attrs, f_text)`` to the graph; return shared formulas by row."""
+        shared: Dict[int, Dict[int, Formula]] = {}
+        graph, sheet_id, masters = self.graph, self.sheet_id, self._masters
+        for letters, digits, f_attrs, f_text in formulas:
+            if b"shared" not in f_attrs:
+                if f_text and graph is not None:
+                    graph.add_text(sheet_id, int(digits), _column_index(letters), f_text)
+                continue
+            row, col = int(digits), _column_index(letters)
+            m = _SHARED_INDEX.search(f_attrs)
+            si = m.group(1) if m else b""
+            formula: Optional[Formula] = None
+            if f_text:
+                formula = "=" + _text(f_text)
+                masters[si] = (formula, row, col)
+            elif si in masters:
+                master, m_row, m_col = masters[si]
+                formula = (master, row - m_row, col - m_col)
+            if formula is not None:
+                shared.setdefault(row, {})[col] = formula
+                if graph is not None:
+                    graph.add_shared(sheet_id, row, col, formula)
+        return shared
+
+    def blocks(self) -> Iterator[_Block]:
+        block: Optional[_Block] = None
+        previous: Optional[Tuple[int, Texts]] = None
+        package = self.package
+        for region, rows, unprefixed in package.regions(self.sheet):
+            if not rows:
+                continue
+            fast = unprefixed and region.count(b"<c") == region.count(b'<c r="')
+            formulas = _FORMULA_FAST.findall(region) if fast else []
+            if len(formulas) != region.count(b"<f"):
+                formulas = [
+                    (cell[0], b"%d" % row, cell[2], cell[4])
+                    for row, body in rows if b"<f" in body
+                    for cell in package.cells(body) if cell[3]
+                ]
+            shared = self._formulas(formulas)
+            if fast:
+                if previous is not None:
+                    self._label_row(*previous, rows[0])
+                previous = (rows[-1][0], self._region_labels(region, rows[-1][0]))
+            else:
+                for row, body in rows:
+                    if previous is not None:
+                        self._label_row(*previous, (row, body))
+                    previous = (row, self._text_cells(body))
+            for row, body in rows:
+                if b"<c" not in body:
+                    continue
+                index = (row - 1) // BLOCK_ROWS
+                if block is None or block.index != index:
+                    if block is not None:
+                        yield self._finish(block)
+                    block = _Block(index)
+                row_shared = shared.get(row)
+                block.entries.append(_ROW_ENTRY.pack((row - 1) % BLOCK_ROWS, package.row_digest(body, row_shared)))
+                if self.keep_rows:
+                    block.rows.append((row, body, row_shared))
+        if previous is not None:
+            self._label_row(*previous, None)
+        if block is not None:
+            yield self._finish(block)
+
+    @staticmethod
+    def _finish(block: _Block) -> _Block:
+        block.digest = hashlib.blake2b(b"".join(block.entries), digest_size=16).digest()
+        return block
+
+
+def _add_defined_names(package: XlsxPackage, label_maps: Dict[str, Dict[str, str]]) -> None:
+    for name, sheet, cell in package.defined_names:
+        if sheet in label_maps and name not in label_maps[sheet]:
+            label_maps[sheet][name] = f"{sheet}!{cell}"
+
+
+class _Report:
+    """Accumulate changes, keeping counts exact and listings capped."""
+
+    def __init__(self, max_changes: int):
+        self.max_changes = max_changes
+        self.changes: List[Dict[str, Any]] = []
+        self.counts = {"formula": 0, "value": 0, "added": 0, "removed": 0, "row": 0}
+        self.changed_keys: List[Tuple[str, int, int]] = []
+        self.blocks = 0
+        self.blocks_changed = 0
+
+    def add(self, change: str, sheet: str, row: int, col: int, old: Any = None, new: Any = None) -> None:
+        self.counts[change] += 1
+        self.changed_keys.append((sheet, row, col))
+        if len(self.changes) < self.max_changes:
+            entry: Dict[str, Any] = {"sheet": sheet, "address": f"{_column_letters(col)}{row}", "change": change}
+            if old is not None:
+                entry["old"] = {"value": old[0], "formula": formula_text(old[1])}
+            if new is not None:
+                entry["new"] = {"value": new[0], "formula": formula_text(new[1])}
+            self.changes.append(entry)
+
+    def compare_rows(self, sheet: str, row: int, old: Cells, new: Cells) -> None:
+        for col in sorted(old.keys() | new.keys()):
+            before, after = old.get(col), new.get(col)
+            if before is None:
+                self.add("added", sheet, row, col, new=after)
+            elif after is None:
+                self.add("removed", sheet, row, col, old=before)
+            elif before[1] != after[1] and formula_text(before[1]) != formula_text(after[1]):
+                self.add("formula", sheet, row, col, before, after)
+            elif before[0] != after[0] or type(before[0]) is bool and type(after[0]) is not bool:
+                self.add("value", sheet, row, col, before, after)
+
+
+def _label_changes(old: Dict[str, Dict[str, str]], new: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+    changes = []
+    for sheet in sorted(old.keys() | new.keys()):
+        before, after = old.get(sheet, {}), new.get(sheet, {})
+        for label in sorted(before.keys() | after.keys()):
+            if before.get(label) != after.get(label):
+                changes.append({"sheet": sheet, "label": label, "old": before.get(label), "new": after.get(label)})
+    return changes
+
+
+def _finish_report(
+    report: _Report,
+    graph: _Graph,
+    sheets_added: List[str],
+    sheets_removed: List[str],
+    labels: List[Dict[str, Any]],
+    max_dependents: int,
+) -> Dict[str, Any]:
+    changed = [
+        graph.key(graph.sheet_ids[sheet.lower()], row, col)
+        for sheet, row, col in report.changed_keys
+        if sheet.lower() in graph.sheet_ids
+    ]
+    dependents, truncated = graph.dependents(changed, max_dependents)
+    counts = dict(report.counts)
+    if not counts["row"]:
+        del counts["row"]
+    return {
+        "sheets_added": sheets_added,
+        "sheets_removed": sheets_removed,
+        "blocks": report.blocks,
+        "blocks_changed": report.blocks_changed,
+        "counts": counts,
+        "changes": report.changes,
+        "changes_truncated": sum(report.counts.values()) > len(report.changes),
+        "labels": labels,
+        "dependents": sorted(graph.address(key) for key in dependents),
+        "dependents_truncated": truncated,
+    }
+
+
+def diff_files(old_path: str, new_path: str, max_changes: int = 500, max_dependents: int = 500) -> Dict[str, Any]:
+    """Compare two workbook files cell by cell.
+
+    Both files are streamed in lockstep, one block of rows per side at a
+    time; blocks and rows whose digests match are skipped without decoding
+    their cells. Formula changes, value changes, added and removed cells,
+    label mapping changes and the cells of the new workbook that depend on
+    any changed cell are reported.
+    """
+    with XlsxPackage(old_path) as old_pkg, XlsxPackage(new_path) as new_pkg:
+        graph = _Graph(list(new_pkg.sheets), new_pkg.name_refs)
+        report = _Report(max_changes)
+        old_labels: Dict[str, Dict[str, str]] = {}
+        new_labels: Dict[str, Dict[str, str]] = {}
+        for sheet in new_pkg.sheets:
+            new_scan = _SheetScan(new_pkg, sheet, graph)
+            if sheet not in old_pkg.sheets:
+                for _ in new_scan.blocks():
+                    pass
+                new_labels[sheet] = new_scan.labels
+                continue
+            old_scan = _SheetScan(old_pkg, sheet)
+            _compare_sheets(report, sheet, old_scan, new_scan)
+            old_labels[sheet] = old_scan.labels
+            new_labels[sheet] = new_scan.labels
+        _add_defined_names(old_pkg, old_labels)
+        _add_defined_names(new_pkg, new_labels)
+        return _finish_report(
+            report,
+            graph,
+            [s for s in new_pkg.sheets if s not in old_pkg.sheets],
+            [s for s in old_pkg.sheets if s not in new_pkg.sheets],
+            _label_changes(old_labels, new_labels),
+            max_dependents,
+        )
+
+
+def _compare_sheets(report: _Report, sheet: str, old_scan: _SheetScan, new_scan: _SheetScan) -> None:
+    old_pkg, new_pkg = old_scan.package, new_scan.package
+    old_blocks, new_blocks = old_scan.blocks(), new_scan.blocks()
+    old = next(old_blocks, None)
+    new = next(new_blocks, None)
+    while old is not None or new is not None:
+        report.blocks += 1
+        if new is None or (old is not None and old.index < new.index):
+            report.blocks_changed += 1
+            for raw_row in old.rows:
+                report.compare_rows(sheet, raw_row[0], old_pkg.decode(raw_row), {})
+            old = next(old_blocks, None)
+        elif old is None or new.index < old.index:
+            report.blocks_changed += 1
+            for raw_row in new.rows:
+                report.compare_rows(sheet, raw_row[0], {}, new_pkg.decode(raw_row))
+            new = next(new_blocks, None)
+        else:
+            if old.digest != new.digest:
+                report.blocks_changed += 1
+                old_rows = {raw_row[0]: raw_row for raw_row in old.rows}
+                old_digests = old.row_digests()
+                new_digests = new.row_digests()
+                for raw_row in new.rows:
+                    row = raw_row[0]
+                    old_row = old_rows.pop(row, None)
+                    if old_digests.get(row) != new_digests[row]:
+                        before = old_pkg.decode(old_row) if old_row is not None else {}
+                        report.compare_rows(sheet, row, before, new_pkg.decode(raw_row))
+                for row, old_row in old_rows.items():
+                    report.compare_rows(sheet, row, old_pkg.decode(old_row), {})
+            old = next(old_blocks, None)
+            new = next(new_blocks, None)
+
+
+def snapshot_file(path: str) -> Tuple[Dict[str, List[Tuple[int, bytes, bytes]]], Dict[str, Dict[str, str]]]:
+    """Return per-sheet ``(block, digest, row_entries)`` and label maps of a file.
+
+    The digests are what :func:`diff_snapshot` later compares a newer file
+    against; cell contents are not kept.
+    """
+    digests: Dict[str, List[Tuple[int, bytes, bytes]]] = {}
+    labels: Dict[str, Dict[str, str]] = {}
+    with XlsxPackage(path) as pkg:
+        for sheet in pkg.sheets:
+            scan = _SheetScan(pkg, sheet, keep_rows=False)
+            digests[sheet] = [(b.index, b.digest, b"".join(b.entries)) for b in scan.blocks()]
+            labels[sheet] = scan.labels
+        _add_defined_names(pkg, labels)
+    return digests, labels
+
+
+def diff_snapshot(
+    digests: Dict[str, Dict[int, Tuple[bytes, bytes]]],
+    labels: Dict[str, Dict[str, str]],
+    new_path: str,
+    max_changes: int = 500,
+    max_dependents: int = 500,
+) -> Dict[str, Any]:
+    """Compare a workbook file against a stored snapshot of an older version.
+
+    ``digests`` maps sheet to ``{block: (digest, row_entries)}``. Old cell
+    contents are not stored, so the cells of changed rows are reported with
+    their new contents only (change ``"row"``), and rows that disappeared
+    are reported by the address of their first column.
+    """
+    with XlsxPackage(new_path) as pkg:
+        graph = _Graph(list(pkg.sheets), pkg.name_refs)
+        report = _Report(max_changes)
+        new_labels: Dict[str, Dict[str, str]] = {}
+        for sheet in pkg.sheets:
+            scan = _SheetScan(pkg, sheet, graph)
+            stored = digests.get(sheet)
+            seen: Set[int] = set()
+            for block in scan.blocks():
+                if stored is None:
+                    continue
+                seen.add(block.index)
+                report.blocks += 1
+                old = stored.get(block.index)
+                if old is not None and old[0] == block.digest:
+                    continue
+                report.blocks_changed += 1
+                old_digests = _unpack_entries(block.index, old[1]) if old is not None else {}
+                new_digests = block.row_digests()
+                for raw_row in block.rows:
+                    row = raw_row[0]
+                    if old_digests.pop(row, None) != new_digests[row]:
+                        for col, info in pkg.decode(raw_row).items():
+                            report.add("row", sheet, row, col, new=info)
+                for row in old_digests:
+                    report.add("removed", sheet, row, 1)
+            for index in (stored or {}).keys() - seen:
+                report.blocks += 1
+                report.blocks_changed += 1
+                for row in _unpack_entries(index, stored[index][1]):
+                    report.add("removed", sheet, row, 1)
+            new_labels[sheet] = scan.labels
+        _add_defined_names(pkg, new_labels)
+        return _finish_report(
+            report,
+            graph,
+            [s for s in pkg.sheets if s not in digests],
+            [s for s in digests if s not in pkg.sheets],
+            _label_changes(labels, new_labels),
+            max_dependents,
+        )
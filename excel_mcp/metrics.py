@@ -0,0 +1,265 @@
+"""Lightweight instrumentation for tools, the database layer and COM access.
+
+Disabled by default; set ``EXCEL_MCP_METRICS=1`` (or call :func:`enable`)
+to record per-call latency histograms, COM attribute accesses, database
+rows written and tool payload sizes. ``EXCEL_MCP_METRICS_LOG=1`` also
+emits one JSON line per instrumented call on the ``excel_mcp.metrics``
+logger. While disabled every hook returns after a single flag check.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("excel_mcp.metrics")
+
+# Upper bucket bounds: milliseconds for latencies, bytes for payloads.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and maximum."""
+
+    __slots__ = ("bounds", "buckets", "count", "total", "max")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the upper bound of the bucket holding quantile ``q``."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "total": round(self.total, 3),
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class _Registry:
+    def __init__(self):
+        self.enabled = _env_flag("EXCEL_MCP_METRICS")
+        self.log = _env_flag("EXCEL_MCP_METRICS_LOG")
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.latency: Dict[str, Histogram] = {}
+        self.payload: Dict[str, Histogram] = {}
+        self.errors: Counter = Counter()
+        self.counters: Counter = Counter()
+        self.com_calls = 0
+        self.com_attributes: Counter = Counter()
+
+
+_registry = _Registry()
+
+
+def enabled() -> bool:
+    return _registry.enabled
+
+
+def enable(log: Optional[bool] = None) -> None:
+    """Start recording; ``log`` toggles the structured log output."""
+    _registry.enabled = True
+    if log is not None:
+        _registry.log = log
+
+
+def disable() -> None:
+    _registry.enabled = False
+
+
+def reset() -> None:
+    with _registry.lock:
+        _registry.reset()
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add ``amount`` to the counter ``name``."""
+    if not _registry.enabled:
+        return
+    with _registry.lock:
+        _registry.counters[name] += amount
+
+
+def _payload_size(result: Any) -> int:
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _emit(record: Dict[str, Any]) -> None:
+    if not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+    logger.info(json.dumps(record, default=str))
+
+
+def instrument(kind: str) -> Callable[[Callable], Callable]:
+    """Decorate a function to record its latency under ``kind.name``.
+
+    Tool results (``kind == "tool"``) also record their JSON payload size
+    and the COM accesses made while the tool ran.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        name = f"{kind}.{fn.__name__}"
+        measure_payload = kind == "tool"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _registry.enabled:
+                return fn(*args, **kwargs)
+            com_before = _registry.com_calls
+            start = time.perf_counter()
+            failed = False
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with _registry.lock:
+                    hist = _registry.latency.get(name)
+                    if hist is None:
+                        hist = _registry.latency[name] = Histogram(LATENCY_BUCKETS_MS)
+                    hist.observe(elapsed_ms)
+                    if failed:
+                        _registry.errors[name] += 1
+            record: Dict[str, Any] = {"event": kind, "name": fn.__name__, "ms": round(elapsed_ms, 3)}
+            if measure_payload:
+                size = _payload_size(result)
+                status = result.get("status") if isinstance(result, dict) else None
+                with _registry.lock:
+                    hist = _registry.payload.get(name)
+                    if hist is None:
+                        hist = _registry.payload[name] = Histogram(SIZE_BUCKETS)
+                    hist.observe(size)
+                    if status == "failure":
+                        _registry.errors[name] += 1
+                record.update(
+                    payload_bytes=size, status=status, com_calls=_registry.com_calls - com_before
+                )
+            if _registry.log:
+                _emit(record)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class _ComProxy:
+    """Forward to a COM object, counting every attribute read and write.
+
+    Returned COM objects, methods and enumerated items are wrapped as
+    well, so a whole object graph reached from ``excel_app`` is counted.
+    """
+
+    __slots__ = ("_com_obj",)
+
+    def __init__(self, obj: Any):
+        object.__setattr__(self, "_com_obj", obj)
+
+    def __getattr__(self, name: str) -> Any:
+        _record_com(name)
+        return _wrap(getattr(self._com_obj, name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        _record_com(name)
+        setattr(self._com_obj, name, unwrap(value))
+
+    def __call__(self, *args, **kwargs) -> Any:
+        # pywin32 cannot marshal the proxy itself, e.g. ``Range(a, b)``.
+        args = tuple(unwrap(arg) for arg in args)
+        kwargs = {name: unwrap(value) for name, value in kwargs.items()}
+        return _wrap(self._com_obj(*args, **kwargs))
+
+    def __iter__(self):
+        for item in iter(self._com_obj):
+            _record_com("__iter__")
+            yield _wrap(item)
+
+    def __repr__(self) -> str:
+        return f"<com proxy {self._com_obj!r}>"
+
+
+def _record_com(name: str) -> None:
+    with _registry.lock:
+        _registry.com_calls += 1
+        _registry.com_attributes[name] += 1
+
+
+def _wrap(value: Any) -> Any:
+    # pywin32 dispatch objects carry ``_oleobj_``; their bound methods are
+    # proxied too. Values such as ``Decimal`` currency cells pass through.
+    if hasattr(value, "_oleobj_") or hasattr(getattr(value, "__self__", None), "_oleobj_"):
+        return _ComProxy(value)
+    return value
+
+
+def com_proxy(obj: Any) -> Any:
+    """Return ``obj`` wrapped for COM counting, or unchanged when disabled."""
+    if not _registry.enabled or obj is None or isinstance(obj, _ComProxy):
+        return obj
+    return _ComProxy(obj)
+
+
+def unwrap(obj: Any) -> Any:
+    """Return the COM object behind a proxy, e.g. for ``WithEvents``."""
+    return object.__getattribute__(obj, "_com_obj") if isinstance(obj, _ComProxy) else obj
+
+
+def snapshot(top_attributes: int = 20) -> Dict[str, Any]:
+    """Return all recorded metrics as plain JSON-serializable data."""
+    with _registry.lock:
+        calls: List[Tuple[str, Any]] = sorted(_registry.latency.items())
+        return {
+            "enabled": _registry.enabled,
+            "latency_ms": {name: hist.to_dict() for name, hist in calls},
+            "payload_bytes": {name: hist.to_dict() for name, hist in sorted(_registry.payload.items())},
+            "errors": dict(_registry.errors),
+            "counters": dict(_registry.counters),
+            "com": {
+                "calls": _registry.com_calls,
+                "attributes": dict(_registry.com_attributes.most_common(top_attributes)),
+            },
+        }
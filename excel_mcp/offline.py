@@ -0,0 +1,321 @@
+# Offline workbook scanning helpers built on openpyxl
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from .sheet_model import SheetCells
+from .utils import collect_column_outputs, gather_row_outputs
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_label(value: Any, is_formula: bool) -> bool:
+    """Return ``True`` for non-empty text that is not a formula."""
+    return not is_formula and isinstance(value, str) and value.strip() != ""
+
+
+def _is_target(value: Any, is_formula: bool) -> bool:
+    """Return ``True`` for cells holding a formula or a numeric constant."""
+    return is_formula or isinstance(value, (int, float))
+
+
+def _resolve_labels(
+    label_map: Dict[str, str],
+    title: str,
+    row_idx: int,
+    row: Sequence[Any],
+    below: Sequence[Any],
+    min_col: int,
+    last_col: Optional[int],
+) -> None:
+    """Add labels found in ``row`` whose target is right of or below them."""
+    width = len(row) if last_col is None else min(len(row), last_col - min_col + 1)
+    for i in range(width):
+        cell = row[i]
+        if not _is_label(cell.value, cell.data_type == "f"):
+            continue
+        label = cell.value.strip()
+        if label in label_map:
+            continue
+        col = min_col + i
+        if i + 1 < len(row) and _is_target(row[i + 1].value, row[i + 1].data_type == "f"):
+            label_map[label] = f"{title}!{get_column_letter(col + 1)}{row_idx}"
+        elif i < len(below) and _is_target(below[i].value, below[i].data_type == "f"):
+            label_map[label] = f"{title}!{get_column_letter(col)}{row_idx + 1}"
+
+
+def build_sheet_label_map(ws: Worksheet, scan_range: Optional[str] = None) -> Dict[str, str]:
+    """Map text labels to the data cell right of or below them.
+
+    Mirrors the heuristic of the ``build_label_address_map`` tool: a label is
+    a non-formula text cell and its target is the first of the right and
+    below neighbours that holds a formula or a number.
+
+    Rows are consumed in order through a two-row window, so worksheets from
+    ``load_workbook(..., read_only=True)`` are scanned without materializing
+    the sheet.
+    """
+    if scan_range:
+        min_col, min_row, max_col, max_row = range_boundaries(scan_range)
+    else:
+        min_col, min_row, max_col, max_row = 1, 1, ws.max_column, ws.max_row
+
+    # Read one extra row and column so edge labels can see their neighbours.
+    rows = ws.iter_rows(
+        min_row=min_row,
+        max_row=max_row + 1 if max_row else None,
+        min_col=min_col,
+        max_col=max_col + 1 if max_col else None,
+    )
+
+    label_map: Dict[str, str] = {}
+    previous: Optional[Sequence[Any]] = None
+    row_idx = min_row - 1
+    for row in rows:
+        if previous is not None:
+            _resolve_labels(label_map, ws.title, row_idx, previous, row, min_col, max_col)
+        previous = row
+        row_idx += 1
+        if max_row and row_idx > max_row:
+            break
+    else:
+        if previous is not None:
+            _resolve_labels(label_map, ws.title, row_idx, previous, (), min_col, max_col)
+    return label_map
+
+
+def _iter_output_rows(
+    path: str, sheet_name: Optional[str], **bounds: Optional[int]
+) -> Iterator[List[Tuple[Any, Optional[str]]]]:
+    """Yield rows of ``(output, formula)`` pairs from a workbook file.
+
+    Formulas and cached values live in separate openpyxl load modes, so two
+    read-only parsers are advanced in lockstep. Formula cells without a
+    cached value fall back to the formula text as their output.
+    """
+    formulas_wb = load_workbook(path, read_only=True)
+    values_wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        title = sheet_name or formulas_wb.sheetnames[0]
+        formula_rows = formulas_wb[title].iter_rows(**bounds)
+        value_rows = values_wb[title].iter_rows(values_only=True, **bounds)
+        for f_row, v_row in zip(formula_rows, value_rows):
+            out: List[Tuple[Any, Optional[str]]] = []
+            for cell, value in zip(f_row, v_row):
+                if cell.data_type == "f":
+                    out.append((cell.value if value is None else value, cell.value))
+                else:
+                    out.append((cell.value, None))
+            yield out
+    finally:
+        formulas_wb.close()
+        values_wb.close()
+
+
+def _append_output(sheet: SheetCells, row: int, col: int, output: Any, formula: Optional[str]) -> None:
+    """Append an ``(output, formula)`` pair from :func:`_iter_output_rows`."""
+    if formula is None:
+        sheet.append(row, col, output)
+    else:
+        sheet.append(row, col, output, formula)
+
+
+def stream_column_outputs(
+    path: str, sheet_name: Optional[str], anchor: str, text_limit: int = 3
+) -> Dict[str, Any]:
+    """Streaming variant of :func:`collect_column_outputs` for a file.
+
+    Only the anchor column is read and at most the 100 filled cells above
+    and 10 below the anchor are kept, the limits of the in-memory scan.
+    """
+    row, col = coordinate_to_tuple(anchor)
+    above: Deque[Tuple[int, Any, Optional[str]]] = deque(maxlen=100)
+    rest: List[Tuple[int, Any, Optional[str]]] = []
+    for offset, cells_row in enumerate(_iter_output_rows(path, sheet_name, min_col=col, max_col=col)):
+        current = offset + 1
+        output, formula = cells_row[0] if cells_row else (None, None)
+        if current < row:
+            if output is not None:
+                above.append((current, output, formula))
+        elif current == row or output is not None:
+            rest.append((current, output, formula))
+            if len(rest) > 10:
+                break
+
+    sheet = SheetCells(sheet_name or "")
+    for current, output, formula in list(above) + rest:
+        _append_output(sheet, current, col, output, formula)
+    return collect_column_outputs(sheet, anchor, text_limit)
+
+
+def stream_row_outputs(
+    path: str, sheet_name: Optional[str], anchor: str, text_limit: int = 3
+) -> Dict[str, Any]:
+    """Streaming variant of :func:`gather_row_outputs` for a file.
+
+    Parsing stops after the anchor row and only that row is kept.
+    """
+    row, anchor_col = coordinate_to_tuple(anchor)
+    sheet = SheetCells(sheet_name or "")
+    for cells_row in _iter_output_rows(path, sheet_name, min_row=row, max_row=row):
+        for i, (output, formula) in enumerate(cells_row):
+            if output is not None or i + 1 == anchor_col:
+                _append_output(sheet, row, i + 1, output, formula)
+    return gather_row_outputs(sheet, anchor, text_limit)
+
+
+def _defined_name_cells(wb: Workbook) -> Iterator[Tuple[str, str, str]]:
+    """Yield ``(name, sheet_title, first_cell)`` for workbook defined names."""
+    for name, defined in wb.defined_names.items():
+        try:
+            destinations = list(defined.destinations)
+        except Exception:
+            continue
+        for sheet_title, ref in destinations:
+            first = ref.replace("$", "").split(":")[0]
+            yield name, sheet_title, first
+            break
+
+
+def build_workbook_label_maps(wb: Workbook) -> Dict[str, Dict[str, str]]:
+    """Return label maps for every worksheet in ``wb`` keyed by sheet title."""
+    maps: Dict[str, Dict[str, str]] = {}
+    for ws in wb.worksheets:
+        maps[ws.title] = build_sheet_label_map(ws)
+    for name, sheet_title, cell in _defined_name_cells(wb):
+        if sheet_title in maps and name not in maps[sheet_title]:
+            maps[sheet_title][name] = f"{sheet_title}!{cell}"
+    return maps
+
+
+def build_file_label_map(
+    path: str, sheet_name: Optional[str] = None, scan_range: Optional[str] = None
+) -> Tuple[str, Dict[str, str]]:
+    """Stream one sheet of a workbook file into a label map.
+
+    Like the live Excel tool, every workbook defined name is added after the
+    scanned labels. Returns ``(sheet_title, label_map)``.
+    """
+    wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        label_map = build_sheet_label_map(ws, scan_range)
+        for name, sheet_title, cell in _defined_name_cells(wb):
+            if name not in label_map:
+                label_map[name] = f"{sheet_title}!{cell}"
+        return ws.title, label_map
+    finally:
+        wb.close()
+
+
+_VBA_SUFFIXES = (".xlsm", ".xltm")
+
+
+def sibling_path(path: str, suffix: str = "inputs") -> str:
+    """Return an unused ``<stem>.<suffix>[-n]<ext>`` path next to ``path``."""
+    stem, ext = os.path.splitext(path)
+    candidate = f"{stem}.{suffix}{ext}"
+    n = 2
+    while os.path.exists(candidate):
+        candidate = f"{stem}.{suffix}-{n}{ext}"
+        n += 1
+    return candidate
+
+
+def write_cell_values(
+    path: str,
+    values: Dict[Optional[str], Dict[Tuple[int, int], Any]],
+    outputs: Sequence[Tuple[Optional[str], int, int]] = (),
+    sheet_name: Optional[str] = None,
+    save_path: Optional[str] = None,
+) -> Tuple[str, List[Any]]:
+    """Write ``{sheet: {(row, col): value}}`` into a copy of a workbook file.
+
+    A ``None`` sheet stands for ``sheet_name`` or the first worksheet.
+    openpyxl cannot recalculate, so the workbook is flagged for a full
+    calculation when Excel next opens it. ``outputs`` are read back after
+    the write, giving formula text for formula cells.
+
+    Saving through openpyxl drops parts it does not model (charts, images,
+    pivot caches...), so the original is left untouched: the result goes
+    to ``save_path`` or to a new sibling file from :func:`sibling_path`.
+    The VBA project of macro-enabled files is kept. Returns
+    ``(saved_path, outputs)``.
+    """
+    wb = load_workbook(path, keep_vba=path.lower().endswith(_VBA_SUFFIXES))
+    try:
+        default = wb[sheet_name] if sheet_name else wb.worksheets[0]
+
+        def sheet(title: Optional[str]) -> Worksheet:
+            return wb[title] if title else default
+
+        for title, cells in values.items():
+            ws = sheet(title)
+            for (row, col), value in cells.items():
+                ws.cell(row=row, column=col).value = value
+        wb.calculation.fullCalcOnLoad = True
+        results = [sheet(title).cell(row=row, column=col).value for title, row, col in outputs]
+        saved = save_path or sibling_path(path)
+        wb.save(saved)
+        return saved, results
+    finally:
+        wb.close()
+
+
+def scan_workbook_file(path: str, skip_hashes: Iterable[str] = ()) -> Dict[str, Any]:
+    """Hash and scan a workbook file for cataloging.
+
+    The workbook is not opened when its hash is in ``skip_hashes``; the
+    result then has ``label_maps`` set to ``None``.
+    """
+    try:
+        content_hash = hash_file(path)
+        result: Dict[str, Any] = {
+            "path": path,
+            "content_hash": content_hash,
+            "modified": os.path.getmtime(path),
+            "label_maps": None,
+        }
+        if content_hash in set(skip_hashes):
+            return result
+        wb = load_workbook(path, read_only=True)
+        try:
+            result["label_maps"] = build_workbook_label_maps(wb)
+        finally:
+            wb.close()
+        return result
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+
+def scan_workbooks(
+    paths: List[str],
+    workers: Optional[int] = None,
+    known_hashes: Optional[Dict[str, Iterable[str]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Scan workbook files in parallel processes, yielding results in order.
+
+    ``known_hashes`` maps paths to content hashes that need no re-scan. With
+    ``workers=1`` files are scanned in the calling process.
+    """
+    known_hashes = known_hashes or {}
+    skips = [tuple(known_hashes.get(p, ())) for p in paths]
+    if workers == 1 or len(paths) <= 1:
+        for path, skip in zip(paths, skips):
+            yield scan_workbook_file(path, skip)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(scan_workbook_file, paths, skips)
@@ -1,25 +1,26 @@
-from typing import Optional, List, Set
+from typing import Any, Callable, Dict, Optional, List, Set, Tuple
+from pathlib import Path
+import argparse
+import os
 import threading
 import time
 
 from . import db
-
-try:
-    import pythoncom  # type: ignore
-except ImportError:  # Not on Windows or pywin32 not installed
-    pythoncom = None
-
-try:
-    import win32com.client as win32
-except ImportError:  # Not on Windows or pywin32 not installed
-    win32 = None
+from . import metrics
 
 from fastmcp.server import FastMCP
 
+# pywin32 is imported by the first tool that needs it; until then both
+# names hold ``_NOT_LOADED``. Either may be patched directly in tests.
+_NOT_LOADED = object()
+pythoncom = _NOT_LOADED
+win32 = _NOT_LOADED
+
 # FastMCP server instance
 server = FastMCP(name="excel-mcp")
 
 excel_app = None
+_XL_CALCULATION_MANUAL = -4135
 _excel_event_handler = None
 _event_thread = None
 _event_stop = threading.Event()
@@ -46,6 +47,24 @@ class _ExcelEventSink:
         })
 
 
+def _load_pywin32():
+    """Import pywin32 on first use and return ``win32com.client`` or ``None``."""
+    global win32, pythoncom
+    if win32 is _NOT_LOADED:
+        try:
+            import win32com.client as client
+        except ImportError:  # Not on Windows or pywin32 not installed
+            client = None
+        win32 = client
+    if pythoncom is _NOT_LOADED:
+        try:
+            import pythoncom as com  # type: ignore
+        except ImportError:  # Not on Windows or pywin32 not installed
+            com = None
+        pythoncom = com
+    return win32
+
+
 def _event_loop():
     if pythoncom is None:
         return
@@ -54,6 +73,7 @@ def _event_loop():
         time.sleep(0.1)
 
 @server.tool
+@metrics.instrument("tool")
 def initialize_database(path: str = "excel_mcp.db"):
     """Initialize persistent DuckDB storage."""
     try:
@@ -63,16 +83,18 @@ def initialize_database(path: str = "excel_mcp.db"):
         return {"status": "failure", "reason": str(e)}
 
 @server.tool
+@metrics.instrument("tool")
 def initialize_excel_link(workbook: Optional[str] = None):
     """Establish a connection to a running Excel instance or open a workbook."""
     global excel_app
-    if win32 is None:
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     try:
         excel_app = win32.GetActiveObject("Excel.Application")
     except Exception:
         excel_app = win32.Dispatch("Excel.Application")
+    excel_app = metrics.com_proxy(excel_app)
 
     if workbook:
         excel_app.Workbooks.Open(workbook)
@@ -88,9 +110,10 @@ def initialize_excel_link(workbook: Optional[str] = None):
 
 
 @server.tool
+@metrics.instrument("tool")
 def get_formula(sheet_name: Optional[str], cell_address: str):
     """Return the formula from a cell or the value if no formula exists."""
-    if win32 is None:
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -119,9 +142,10 @@ def get_formula(sheet_name: Optional[str], cell_address: str):
 
 
 @server.tool
+@metrics.instrument("tool")
 def trace_precedents(sheet_name: Optional[str], cell_address: str):
     """Return all precedent cell addresses for a given cell."""
-    if win32 is None:
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -166,9 +190,10 @@ def trace_precedents(sheet_name: Optional[str], cell_address: str):
 
 
 @server.tool
+@metrics.instrument("tool")
 def trace_dependents(sheet_name: Optional[str], cell_address: str):
     """Return all dependent cell addresses for a given cell."""
-    if win32 is None:
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -229,9 +254,10 @@ def _adjacent_text_labels(cell, radius: int) -> List[str]:
 
 
 @server.tool
+@metrics.instrument("tool")
 def find_cell_labels(sheet_name: Optional[str], cell_address: str, search_radius: int = 1):
     """Attempt to identify human-readable labels for a given cell."""
-    if win32 is None:
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -272,10 +298,53 @@ def find_cell_labels(sheet_name: Optional[str], cell_address: str, search_radius
         return {"status": "failure", "reason": str(e)}
 
 
+def _store_workbook_labels(path: Optional[str], sheet: str, label_map: Dict[str, str]) -> None:
+    """Store a sheet's label map under the catalog version of the file at ``path``.
+
+    Without a path the mappings are stored as being of unknown origin.
+    """
+    if not db.is_connected():
+        return
+    if path is None:
+        db.store_label_map(sheet, label_map)
+        return
+    from . import offline
+
+    content_hash = offline.hash_file(path) if os.path.isfile(path) else ""
+    db.store_workbook_labels(path, content_hash, {sheet: label_map})
+
+
+def _live_workbook_path(wb) -> Optional[str]:
+    """Return the saved file behind a live workbook, if it can be read."""
+    try:
+        return wb.FullName
+    except Exception:
+        return None
+
+
 @server.tool
-def build_label_address_map(sheet_name: Optional[str], scan_range: Optional[str] = None):
-    """Return a heuristic mapping of labels to cell addresses for a worksheet."""
-    if win32 is None:
+@metrics.instrument("tool")
+def build_label_address_map(
+    sheet_name: Optional[str],
+    scan_range: Optional[str] = None,
+    workbook_path: Optional[str] = None,
+):
+    """Return a heuristic mapping of labels to cell addresses for a worksheet.
+
+    With ``workbook_path`` the saved file is streamed in read-only mode
+    instead of querying the live Excel instance.
+    """
+    if workbook_path:
+        try:
+            from . import offline
+
+            title, label_map = offline.build_file_label_map(workbook_path, sheet_name, scan_range)
+            _store_workbook_labels(workbook_path, title, label_map)
+            return {"status": "success", "sheet": title, "label_map": label_map}
+        except Exception as e:
+            return {"status": "failure", "reason": str(e)}
+
+    if _load_pywin32() is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -331,7 +400,7 @@ def build_label_address_map(sheet_name: Optional[str], scan_range: Optional[str]
         except Exception:
             pass
 
-        db.store_label_map(ws.Name, label_map)
+        _store_workbook_labels(_live_workbook_path(wb), ws.Name, label_map)
         return {
             "status": "success",
             "sheet": ws.Name,
@@ -342,21 +411,412 @@ def build_label_address_map(sheet_name: Optional[str], scan_range: Optional[str]
 
 
 @server.tool
-def query_label(label: str):
+@metrics.instrument("tool")
+def gather_cell_outputs(
+    workbook_path: str,
+    sheet_name: Optional[str],
+    anchor: str,
+    axis: str = "column",
+    text_limit: int = 3,
+):
+    """Stream output values around ``anchor`` along a column or row of a file."""
+    if axis not in ("column", "row"):
+        return {"status": "failure", "reason": f"unknown axis: {axis}"}
+
+    try:
+        from . import offline
+
+        if axis == "column":
+            outputs = offline.stream_column_outputs(workbook_path, sheet_name, anchor, text_limit)
+        else:
+            outputs = offline.stream_row_outputs(workbook_path, sheet_name, anchor, text_limit)
+        return {"status": "success", "anchor": anchor, "outputs": outputs}
+    except Exception as e:
+        return {"status": "failure", "reason": str(e)}
+
+
+@server.tool
+@metrics.instrument("tool")
+def query_label(label: str, workbook: Optional[str] = None):
     """Query stored label mappings from the database."""
     try:
-        rows = db.query_label(label)
-        results = [{"sheet": r[0], "address": r[1]} for r in rows]
+        rows = db.query_label(label, workbook)
+        results = [{"workbook": r[0], "sheet": r[1], "address": r[2]} for r in rows]
+        return {"status": "success", "results": results}
+    except Exception as e:  # pragma: no cover - simple wrapper
+        return {"status": "failure", "reason": str(e)}
+
+
+@server.tool
+@metrics.instrument("tool")
+def search_labels(query: str, limit: int = 10, workbook: Optional[str] = None):
+    """Search stored labels with case-insensitive, prefix and fuzzy matching."""
+    try:
+        rows = db.search_labels(query, limit, workbook)
+        results = [
+            {"label": r[0], "workbook": r[1], "sheet": r[2], "address": r[3], "score": r[4]}
+            for r in rows
+        ]
         return {"status": "success", "results": results}
     except Exception as e:  # pragma: no cover - simple wrapper
         return {"status": "failure", "reason": str(e)}
 
 
 @server.tool
+@metrics.instrument("tool")
+def catalog_workbooks(
+    directory: str,
+    pattern: str = "*.xlsx",
+    recursive: bool = False,
+    workers: Optional[int] = None,
+):
+    """Scan every workbook in a directory and store its label mappings."""
+    if not db.is_connected():
+        return {"status": "failure", "reason": "database not initialized"}
+
+    try:
+        from . import offline
+
+        root = Path(directory)
+        if not root.is_dir():
+            return {"status": "failure", "reason": f"not a directory: {directory}"}
+        matches = root.rglob(pattern) if recursive else root.glob(pattern)
+        paths = sorted(os.path.abspath(p) for p in matches if p.is_file())
+
+        known: Dict[str, List[str]] = {}
+        for path, content_hash, _, _ in db.list_workbooks(all_versions=True, cataloged_only=True):
+            known.setdefault(path, []).append(content_hash)
+
+        cataloged, unchanged, errors = 0, 0, []
+        for result in offline.scan_workbooks(paths, workers, known):
+            if "error" in result:
+                errors.append({"path": result["path"], "reason": result["error"]})
+                continue
+            if result["label_maps"] is None:
+                db.register_workbook(result["path"], result["content_hash"], result["modified"])
+                unchanged += 1
+                continue
+            db.store_workbook_labels(
+                result["path"],
+                result["content_hash"],
+                result["label_maps"],
+                result["modified"],
+                cataloged=True,
+            )
+            cataloged += 1
+
+        return {
+            "status": "success",
+            "cataloged": cataloged,
+            "unchanged": unchanged,
+            "errors": errors,
+        }
+    except Exception as e:
+        return {"status": "failure", "reason": str(e)}
+
+
+@server.tool
+@metrics.instrument("tool")
+def snapshot_workbook(workbook_path: str):
+    """Record hashed row blocks and label mappings of a workbook version.
+
+    The stored snapshot lets ``diff_workbooks`` compare a later version of
+    the file without keeping a copy of it.
+    """
+    if not db.is_connected():
+        return {"status": "failure", "reason": "database not initialized"}
+
+    try:
+        from . import diff, offline
+
+        blocks, label_maps = diff.snapshot_file(workbook_path)
+        content_hash = offline.hash_file(workbook_path)
+        db.store_workbook_labels(workbook_path, content_hash, label_maps, cataloged=True, blocks=blocks)
+        path = os.path.abspath(workbook_path)
+        version = next(
+            v for p, h, v, _ in db.list_workbooks(all_versions=True) if p == path and h == content_hash
+        )
+        return {
+            "status": "success",
+            "version": version,
+            "sheets": {sheet: len(sheet_blocks) for sheet, sheet_blocks in blocks.items()},
+        }
+    except Exception as e:
+        return {"status": "failure", "reason": str(e)}
+
+
+@server.tool
+@metrics.instrument("tool")
+def diff_workbooks(
+    new_path: str,
+    old_path: Optional[str] = None,
+    old_version: Optional[int] = None,
+    max_changes: int = 500,
+    max_dependents: int = 500,
+):
+    """Compare two versions of a workbook cell by cell.
+
+    With ``old_path`` both files are compared and old and new contents of
+    every changed cell are reported. Otherwise ``new_path`` is compared
+    against a snapshot taken with ``snapshot_workbook``: ``old_version`` or
+    the newest snapshot with different contents. Cells whose formulas
+    depend on a changed cell are listed under ``dependents``.
+    """
+    try:
+        from . import diff
+
+        if old_path:
+            report = diff.diff_files(old_path, new_path, max_changes, max_dependents)
+            return {"status": "success", **report}
+
+        if not db.is_connected():
+            return {"status": "failure", "reason": "database not initialized"}
+        from . import offline
+
+        content_hash = offline.hash_file(new_path)
+        found = db.find_workbook_version(
+            new_path, old_version, None if old_version is not None else content_hash
+        )
+        if found is None:
+            return {"status": "failure", "reason": f"no snapshot of {new_path} to compare against"}
+        workbook_id, version = found
+        report = diff.diff_snapshot(
+            db.load_sheet_blocks(workbook_id),
+            db.load_label_maps(workbook_id),
+            new_path,
+            max_changes,
+            max_dependents,
+        )
+        return {"status": "success", "old_version": version, **report}
+    except Exception as e:
+        return {"status": "failure", "reason": str(e)}
+
+
+CellRef = Tuple[Optional[str], int, int]
+
+
+def _resolve_cells(
+    keys: List[str],
+    workbook_path: Optional[str],
+    default_sheet: Optional[str] = None,
+    fallback: Optional[Callable[[], Dict[str, str]]] = None,
+) -> Tuple[Dict[str, CellRef], List[str], List[str]]:
+    """Resolve address or label keys to ``(sheet, row, col)``.
+
+    Sheet-qualified or ``$``-anchored keys are always addresses. Other keys
+    are looked up as labels first, among the mappings stored for
+    ``workbook_path``, then among those of unknown origin and finally in
+    the label map returned by ``fallback``. A key that names labels on
+    several cells, or both a label and a different cell address (``FY2025``,
+    ``Q1``), is ambiguous. Addresses without a sheet get ``default_sheet``.
+    Returns ``(resolved, missing, ambiguous)``.
+    """
+    from .utils import parse_cell_reference
+
+    resolved: Dict[str, CellRef] = {}
+    missing: List[str] = []
+    ambiguous: List[str] = []
+    labels: Optional[Dict[str, str]] = None
+    refs = {key: parse_cell_reference(key) for key in keys}
+    for key, ref in refs.items():
+        if ref is not None and (ref[0] is not None or "$" in key):
+            resolved[key] = ref
+    # All label keys are looked up in one query; per key, mappings of
+    # ``workbook_path`` win over those of unknown origin.
+    own = os.path.abspath(workbook_path) if workbook_path else None
+    stored: Dict[str, Dict[str, Set[str]]] = {}
+    for label, path, _, address in db.query_labels([key for key in keys if key not in resolved], workbook_path):
+        stored.setdefault(label, {}).setdefault(path, set()).add(address)
+    for key in keys:
+        if key in resolved:
+            continue
+        ref = refs[key]
+        by_path = stored.get(key, {})
+        addresses = by_path.get(own) or by_path.get("", set())
+        if not addresses and fallback is not None:
+            if labels is None:
+                labels = fallback()
+            if key in labels:
+                addresses = {labels[key]}
+        targets = {t for t in map(parse_cell_reference, addresses) if t is not None}
+        if ref is not None:
+            if any(t[1:] != ref[1:] or (t[0] or default_sheet) != default_sheet for t in targets):
+                ambiguous.append(key)
+                continue
+            targets = {ref}
+        if len(targets) > 1:
+            ambiguous.append(key)
+        elif not targets:
+            missing.append(key)
+        else:
+            sheet, row, col = targets.pop()
+            resolved[key] = (sheet or default_sheet, row, col)
+    return resolved, missing, ambiguous
+
+
+def _unresolved(missing: List[str], ambiguous: List[str]) -> Optional[Dict[str, str]]:
+    """Failure result naming unresolved and ambiguous keys, if there are any."""
+    reasons = []
+    if missing:
+        reasons.append(f"unresolved cells: {', '.join(missing)}")
+    if ambiguous:
+        reasons.append(f"ambiguous cells: {', '.join(ambiguous)}")
+    return {"status": "failure", "reason": "; ".join(reasons)} if reasons else None
+
+
+def _group_by_sheet(
+    inputs: Dict[str, Any], targets: Dict[str, CellRef]
+) -> Dict[Optional[str], Dict[Tuple[int, int], Any]]:
+    values: Dict[Optional[str], Dict[Tuple[int, int], Any]] = {}
+    for key, value in inputs.items():
+        sheet, row, col = targets[key]
+        values.setdefault(sheet, {})[(row, col)] = value
+    return values
+
+
+def _block_address(row: int, col: int, block: List[List[Any]]) -> str:
+    from openpyxl.utils.cell import get_column_letter
+
+    start = f"{get_column_letter(col)}{row}"
+    if len(block) == 1 and len(block[0]) == 1:
+        return start
+    return f"{start}:{get_column_letter(col + len(block[0]) - 1)}{row + len(block) - 1}"
+
+
+def _set_file_inputs(
+    workbook_path: str,
+    inputs: Dict[str, Any],
+    outputs: List[str],
+    sheet_name: Optional[str],
+    save_path: Optional[str],
+):
+    from . import offline
+
+    targets, missing, ambiguous = _resolve_cells(
+        list(inputs) + outputs,
+        workbook_path,
+        fallback=lambda: offline.build_file_label_map(workbook_path, sheet_name)[1],
+    )
+    failure = _unresolved(missing, ambiguous)
+    if failure:
+        return failure
+
+    values = _group_by_sheet(inputs, targets)
+    saved, results = offline.write_cell_values(
+        workbook_path, values, [targets[key] for key in outputs], sheet_name, save_path
+    )
+    return {
+        "status": "success",
+        "saved_path": saved,
+        "written": len(inputs),
+        "recalculated": False,
+        "outputs": dict(zip(outputs, results)),
+    }
+
+
+def _set_live_inputs(inputs: Dict[str, Any], outputs: List[str], sheet_name: Optional[str]):
+    from .utils import group_contiguous_cells
+
+    wb = excel_app.ActiveWorkbook
+    ws = wb.Worksheets(sheet_name) if sheet_name else wb.ActiveSheet
+    try:
+        workbook_path = os.path.abspath(wb.FullName) if db.is_connected() else None
+    except Exception:
+        workbook_path = None
+    title = ws.Name
+    targets, missing, ambiguous = _resolve_cells(list(inputs) + outputs, workbook_path, title)
+    failure = _unresolved(missing, ambiguous)
+    if failure:
+        return failure
+
+    sheets = {title: ws}
+
+    def sheet(name: str):
+        if name not in sheets:
+            sheets[name] = wb.Worksheets(name)
+        return sheets[name]
+
+    calculation = excel_app.Calculation
+    screen_updating = excel_app.ScreenUpdating
+    enable_events = excel_app.EnableEvents
+    try:
+        excel_app.ScreenUpdating = False
+        excel_app.EnableEvents = False
+        excel_app.Calculation = _XL_CALCULATION_MANUAL
+        writes = 0
+        for name, cells in _group_by_sheet(inputs, targets).items():
+            target = sheet(name)
+            for row, col, block in group_contiguous_cells(cells):
+                rng = target.Range(_block_address(row, col, block))
+                rng.Value = block[0][0] if len(block) == 1 and len(block[0]) == 1 else tuple(map(tuple, block))
+                writes += 1
+        excel_app.Calculate()
+        results = {}
+        for key in outputs:
+            name, row, col = targets[key]
+            results[key] = sheet(name).Range(_block_address(row, col, [[None]])).Value
+    finally:
+        excel_app.Calculation = calculation
+        excel_app.ScreenUpdating = screen_updating
+        excel_app.EnableEvents = enable_events
+
+    return {
+        "status": "success",
+        "sheet": title,
+        "written": len(inputs),
+        "writes": writes,
+        "recalculated": True,
+        "outputs": results,
+    }
+
+
+@server.tool
+@metrics.instrument("tool")
+def set_inputs(
+    inputs: Dict[str, Any],
+    outputs: Optional[List[str]] = None,
+    sheet_name: Optional[str] = None,
+    workbook_path: Optional[str] = None,
+    save_path: Optional[str] = None,
+):
+    """Write many input cells, recalculate once and return output values.
+
+    Keys of ``inputs`` and entries of ``outputs`` are cell addresses such as
+    ``B5`` or ``DCF!B5``, or stored labels. A bare key that is both a label
+    and an address of another cell (``FY2025``) is rejected as ambiguous;
+    write ``DCF!FY2025`` or ``$FY$2025`` to mean the address. Adjacent
+    cells are written as one range with calculation, screen updating and
+    events suspended. With
+    ``workbook_path`` the file is edited offline instead; it is not
+    recalculated, formula outputs are returned as formula text, and the
+    result is saved to ``save_path`` or to a new ``<name>.inputs.xlsx``
+    next to it; the original file is never overwritten by default.
+    """
+    outputs = list(outputs or [])
+    if workbook_path:
+        try:
+            return _set_file_inputs(workbook_path, inputs, outputs, sheet_name, save_path)
+        except Exception as e:
+            return {"status": "failure", "reason": str(e)}
+
+    if _load_pywin32() is None:
+        return {"status": "failure", "reason": "pywin32 not available"}
+
+    if excel_app is None:
+        return {"status": "failure", "reason": "excel link not initialized"}
+
+    try:
+        return _set_live_inputs(inputs, outputs, sheet_name)
+    except Exception as e:
+        return {"status": "failure", "reason": str(e)}
+
+
+@server.tool
+@metrics.instrument("tool")
 def start_excel_event_monitor():
     """Begin monitoring Excel events to record changes."""
     global _excel_event_handler, _event_thread
-    if win32 is None or pythoncom is None:
+    if _load_pywin32() is None or pythoncom is None:
         return {"status": "failure", "reason": "pywin32 not available"}
 
     if excel_app is None:
@@ -365,7 +825,7 @@ def start_excel_event_monitor():
     if _event_thread and _event_thread.is_alive():
         return {"status": "running"}
 
-    _excel_event_handler = win32.WithEvents(excel_app, _ExcelEventSink)
+    _excel_event_handler = win32.WithEvents(metrics.unwrap(excel_app), _ExcelEventSink)
     _event_stop.clear()
     _event_thread = threading.Thread(target=_event_loop, daemon=True)
     _event_thread.start()
@@ -373,6 +833,7 @@ def start_excel_event_monitor():
 
 
 @server.tool
+@metrics.instrument("tool")
 def stop_excel_event_monitor():
     """Stop monitoring Excel events."""
     global _excel_event_handler, _event_thread
@@ -387,6 +848,7 @@ def stop_excel_event_monitor():
 
 
 @server.tool
+@metrics.instrument("tool")
 def fetch_excel_events():
     """Retrieve and clear recorded Excel events."""
     if _excel_event_handler is None:
@@ -397,6 +859,30 @@ def fetch_excel_events():
     return {"status": "success", "events": events}
 
 
+@server.tool
+def get_server_metrics(reset: bool = False):
+    """Return recorded tool and database latencies, COM accesses and sizes.
+
+    Recording is enabled with the ``EXCEL_MCP_METRICS`` environment variable.
+    """
+    result = metrics.snapshot()
+    if reset:
+        metrics.reset()
+    return {"status": "success", **result}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the server; HTTP transport by default, stdio for spawned workers."""
+    parser = argparse.ArgumentParser(description="Excel MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=("streamable-http", "stdio"),
+        default="streamable-http",
+        help="MCP transport to serve on",
+    )
+    args = parser.parse_args(argv)
+    server.run(transport=args.transport)
+
+
 if __name__ == "__main__":
-    # Run server using HTTP transport by default
-    server.run(transport="streamable-http")
+    main()
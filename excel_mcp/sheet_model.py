@@ -0,0 +1,203 @@
+# Compact in-memory representation of scanned worksheet cells
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter
+
+# Value kinds stored per cell in ``SheetCells.kinds``.
+KIND_NONE = 0
+KIND_FLOAT = 1
+KIND_INT = 2
+KIND_BOOL = 3
+KIND_OBJECT = 4
+
+_NO_REF = -1
+
+
+class SheetCells:
+    """Column-oriented store of the cells of one worksheet.
+
+    Every cell occupies one slot in a set of parallel typed arrays: row and
+    column coordinates, a value kind, a float slot for numbers and booleans
+    and a reference into shared pools for text or other objects and for
+    formulas. Equal strings are stored once, which keeps repeated formulas
+    and labels cheap. The arrays take 23 bytes per cell; with the pools a
+    sheet whose rows each hold a distinct formula averages about 55 bytes
+    per cell (``benchmarks/bench_sheet_model.py``), against some 300 for
+    an address-keyed dictionary of dictionaries.
+
+    Cells are expected in row-major order, as produced by row iteration;
+    out-of-order appends are accepted and sorted on the next lookup.
+    """
+
+    __slots__ = (
+        "title", "rows", "cols", "kinds", "numbers", "refs", "formulas",
+        "_objects", "_object_ids", "_formulas", "_formula_ids",
+        "_sorted", "_last_key", "_col_index",
+    )
+
+    def __init__(self, title: str = ""):
+        self.title = title
+        self.rows = array("I")
+        self.cols = array("H")
+        self.kinds = array("b")
+        self.numbers = array("d")
+        self.refs = array("i")
+        self.formulas = array("i")
+        self._objects: List[Any] = []
+        self._object_ids: Dict[Any, int] = {}
+        self._formulas: List[Optional[str]] = []
+        self._formula_ids: Dict[Optional[str], int] = {}
+        self._sorted = True
+        self._last_key = -1
+        self._col_index: Optional[Dict[int, array]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _intern_object(self, value: Any) -> int:
+        """Return the pool index of ``value``, sharing equal hashable values."""
+        try:
+            idx = self._object_ids.get(value)
+        except TypeError:  # unhashable values are stored without sharing
+            idx = None
+            hashable = False
+        else:
+            hashable = True
+        if idx is None:
+            idx = len(self._objects)
+            self._objects.append(value)
+            if hashable:
+                self._object_ids[value] = idx
+        return idx
+
+    def _intern_formula(self, formula: Optional[str]) -> int:
+        """Return the pool index of ``formula``."""
+        idx = self._formula_ids.get(formula)
+        if idx is None:
+            idx = len(self._formulas)
+            self._formulas.append(formula)
+            self._formula_ids[formula] = idx
+        return idx
+
+    def append(self, row: int, col: int, output: Any, formula: Any = _NO_REF) -> None:
+        """Add a cell; pass ``formula`` only for cells that have one."""
+        # Column XFD is 16384, so columns need 15 bits.
+        key = (row << 15) | col
+        if key <= self._last_key:
+            self._sorted = False
+        self._last_key = max(self._last_key, key)
+        self._col_index = None
+
+        self.rows.append(row)
+        self.cols.append(col)
+        ref = _NO_REF
+        number = 0.0
+        if output is None:
+            kind = KIND_NONE
+        elif isinstance(output, bool):
+            kind, number = KIND_BOOL, float(output)
+        elif isinstance(output, int) and -(1 << 53) <= output <= (1 << 53):
+            kind, number = KIND_INT, float(output)
+        elif isinstance(output, float):
+            kind, number = KIND_FLOAT, output
+        else:
+            kind, ref = KIND_OBJECT, self._intern_object(output)
+        self.kinds.append(kind)
+        self.numbers.append(number)
+        self.refs.append(ref)
+        self.formulas.append(_NO_REF if formula is _NO_REF else self._intern_formula(formula))
+
+    def output(self, pos: int) -> Any:
+        """Return the output value stored at position ``pos``."""
+        kind = self.kinds[pos]
+        if kind == KIND_FLOAT:
+            return self.numbers[pos]
+        if kind == KIND_INT:
+            return int(self.numbers[pos])
+        if kind == KIND_BOOL:
+            return bool(self.numbers[pos])
+        if kind == KIND_OBJECT:
+            return self._objects[self.refs[pos]]
+        return None
+
+    def has_formula(self, pos: int) -> bool:
+        """Return ``True`` if the cell at ``pos`` carries a formula."""
+        return self.formulas[pos] != _NO_REF
+
+    def formula(self, pos: int) -> Optional[str]:
+        """Return the formula at ``pos`` or ``None`` when there is none."""
+        ref = self.formulas[pos]
+        return None if ref == _NO_REF else self._formulas[ref]
+
+    def _ensure_sorted(self) -> None:
+        """Restore row-major order after out-of-order appends."""
+        if self._sorted:
+            return
+        order = sorted(range(len(self.rows)), key=lambda i: (self.rows[i], self.cols[i]))
+        for name in ("rows", "cols", "kinds", "numbers", "refs", "formulas"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+        self._sorted = True
+
+    def find(self, row: int, col: int) -> Optional[int]:
+        """Return the position of the cell at ``(row, col)`` if stored."""
+        self._ensure_sorted()
+        lo = bisect_left(self.rows, row)
+        hi = bisect_right(self.rows, row, lo)
+        pos = bisect_left(self.cols, col, lo, hi)
+        if pos < hi and self.cols[pos] == col:
+            return pos
+        return None
+
+    def row_positions(self, row: int) -> range:
+        """Return positions of the cells in ``row`` ordered by column."""
+        self._ensure_sorted()
+        lo = bisect_left(self.rows, row)
+        return range(lo, bisect_right(self.rows, row, lo))
+
+    def column_positions(self, col: int) -> array:
+        """Return positions of the cells in ``col`` ordered by row."""
+        self._ensure_sorted()
+        if self._col_index is None:
+            index: Dict[int, array] = {}
+            for pos, c in enumerate(self.cols):
+                positions = index.get(c)
+                if positions is None:
+                    positions = index[c] = array("I")
+                positions.append(pos)
+            self._col_index = index
+        return self._col_index.get(col, array("I"))
+
+    def address(self, pos: int) -> str:
+        """Return the A1 address of the cell at ``pos``."""
+        return f"{get_column_letter(self.cols[pos])}{self.rows[pos]}"
+
+    def __iter__(self) -> Iterator[Tuple[int, int, Any, Optional[str]]]:
+        """Yield ``(row, col, output, formula)`` in row-major order."""
+        self._ensure_sorted()
+        for pos in range(len(self.rows)):
+            yield self.rows[pos], self.cols[pos], self.output(pos), self.formula(pos)
+
+    @classmethod
+    def from_cells(cls, cells: Dict[str, Dict[str, Any]], title: str = "") -> "SheetCells":
+        """Build from the address-keyed ``{"output", "formula"}`` format."""
+        sheet = cls(title)
+        for addr, info in cells.items():
+            row, col = coordinate_to_tuple(addr)
+            if "formula" in info:
+                sheet.append(row, col, info.get("output"), info["formula"])
+            else:
+                sheet.append(row, col, info.get("output"))
+        return sheet
+
+    def to_cells(self) -> Dict[str, Dict[str, Any]]:
+        """Return the address-keyed ``{"output", "formula"}`` format."""
+        cells: Dict[str, Dict[str, Any]] = {}
+        for pos in range(len(self.rows)):
+            info: Dict[str, Any] = {"output": self.output(pos)}
+            if self.has_formula(pos):
+                info["formula"] = self.formula(pos)
+            cells[self.address(pos)] = info
+        return cells
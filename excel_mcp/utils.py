@@ -1,9 +1,15 @@
 # Utility helper functions for Excel MCP
-from typing import Dict, List, Any, Iterable, Tuple
-from time import perf_counter
+from typing import Dict, List, Any, Iterable, Optional, Tuple, Union
+from bisect import bisect_left
+import re
 from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 
+from . import metrics
+from .sheet_model import KIND_NONE, KIND_OBJECT, SheetCells
+
+_CELL_REFERENCE = re.compile(r"^(?:'?(?P<sheet>[^!]+?)'?!)?\$?(?P<col>[A-Za-z]{1,3})\$?(?P<row>\d+)$")
+
 
 def _col_to_index(col: str) -> int:
     """Convert Excel column letters (e.g. 'A', 'BC') to a 1-based index."""
@@ -57,7 +63,97 @@ def address_within_ranges(target: str, ranges: List[str]) -> bool:
     return False
 
 
-def collect_column_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_limit: int = 3) -> Dict[str, Any]:
+def parse_cell_reference(ref: str) -> Optional[Tuple[Optional[str], int, int]]:
+    """Split ``Sheet!B5`` or ``B5`` into ``(sheet, row, column)``.
+
+    The sheet is ``None`` when ``ref`` has no sheet prefix; ``None`` is
+    returned for anything that is not a single-cell reference.
+    """
+    match = _CELL_REFERENCE.match(ref.strip())
+    if match is None:
+        return None
+    row = int(match.group("row"))
+    col = _col_to_index(match.group("col"))
+    if row < 1 or row > 1048576 or col > 16384:
+        return None
+    return match.group("sheet"), row, col
+
+
+def group_contiguous_cells(cells: Dict[Tuple[int, int], Any]) -> List[Tuple[int, int, List[List[Any]]]]:
+    """Group ``{(row, col): value}`` into rectangular blocks of adjacent cells.
+
+    Runs of consecutive columns within a row are merged with the runs of
+    following rows that span exactly the same columns. Each block is
+    returned as ``(top_row, left_col, rows_of_values)``.
+    """
+    runs: List[Tuple[int, int, List[Any]]] = []
+    for row, col in sorted(cells):
+        last = runs[-1] if runs else None
+        if last is not None and last[0] == row and last[1] + len(last[2]) == col:
+            last[2].append(cells[(row, col)])
+        else:
+            runs.append((row, col, [cells[(row, col)]]))
+
+    blocks: List[Tuple[int, int, List[List[Any]]]] = []
+    # Blocks that may still grow downward, keyed by (left_col, width).
+    open_blocks: Dict[Tuple[int, int], Tuple[int, int, List[List[Any]]]] = {}
+    for row, col, values in runs:
+        key = (col, len(values))
+        block = open_blocks.get(key)
+        if block is not None and block[0] + len(block[2]) == row:
+            block[2].append(values)
+            continue
+        block = (row, col, [values])
+        blocks.append(block)
+        open_blocks[key] = block
+    return blocks
+
+
+def _is_text_output(sheet: SheetCells, pos: int) -> bool:
+    """Return ``True`` for a non-formula cell whose output is not numeric."""
+    if sheet.has_formula(pos):
+        return False
+    kind = sheet.kinds[pos]
+    if kind != KIND_OBJECT:
+        return kind == KIND_NONE
+    try:
+        float(sheet.output(pos))
+        return False
+    except (ValueError, TypeError):
+        return True
+
+
+def _as_sheet(
+    cells: Union[Dict[str, Dict[str, Any]], SheetCells],
+    column: Optional[str] = None,
+    row: Optional[int] = None,
+) -> SheetCells:
+    """Adapt the address-keyed cell mapping to :class:`SheetCells`.
+
+    Only the addresses in ``column`` or ``row`` are converted, selected with
+    plain string tests so large mappings are not parsed cell by cell.
+    """
+    if isinstance(cells, SheetCells):
+        return cells
+    if column is not None:
+        width = len(column)
+        subset = {
+            addr: info for addr, info in cells.items()
+            if addr.startswith(column) and addr[width:width + 1].isdigit()
+        }
+    else:
+        suffix = str(row)
+        width = len(suffix)
+        subset = {
+            addr: info for addr, info in cells.items()
+            if addr.endswith(suffix) and addr[-width - 1:-width].isalpha()
+        }
+    return SheetCells.from_cells(subset)
+
+
+def collect_column_outputs(
+    cells: Union[Dict[str, Dict[str, Any]], SheetCells], anchor: str, text_limit: int = 3
+) -> Dict[str, Any]:
     """Gather output values from cells in the same column as ``anchor``.
 
     Scans upward until ``text_limit`` consecutive non-formula and non-numeric
@@ -67,8 +163,8 @@ def collect_column_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_l
     Parameters
     ----------
     cells:
-        Mapping of addresses to dictionaries with at least an ``output`` key and
-        optionally a ``formula`` key.
+        A :class:`SheetCells` store, or a mapping of addresses to dictionaries
+        with at least an ``output`` key and optionally a ``formula`` key.
     anchor:
         Address like ``A10`` that serves as the starting point.
     text_limit:
@@ -82,58 +178,52 @@ def collect_column_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_l
 
     row, col_idx = coordinate_to_tuple(anchor)
     column = get_column_letter(col_idx)
+    sheet = _as_sheet(cells, column=column)
 
-    valid = {k: v for k, v in cells.items() if v.get("output") is not None}
+    positions = sheet.column_positions(col_idx)
+    rows = sheet.rows
+    # First position at or below the anchor row.
+    split = bisect_left(positions, row, key=rows.__getitem__)
 
     result: Dict[str, Any] = {}
 
     consecutive_text = 0
-    current = row - 1
     inspected = 0
-    while current >= 1 and inspected < 100:
-        addr = f"{column}{current}"
-        if addr in valid:
-            info = valid[addr]
-            result[addr] = info["output"]
-            inspected += 1
-            if "formula" not in info:
-                try:
-                    float(info["output"])
-                    is_number = True
-                except (ValueError, TypeError):
-                    is_number = False
-                if not is_number:
-                    consecutive_text += 1
-                    if consecutive_text >= text_limit:
-                        break
-        current -= 1
-
-    if anchor in cells:
-        result[anchor] = cells[anchor].get("output")
-
-    max_row = max((coordinate_to_tuple(a)[0] for a in valid), default=row)
-    current = row + 1
+    for i in range(split - 1, -1, -1):
+        if inspected >= 100:
+            break
+        pos = positions[i]
+        if sheet.kinds[pos] == KIND_NONE:
+            continue
+        result[f"{column}{rows[pos]}"] = sheet.output(pos)
+        inspected += 1
+        if _is_text_output(sheet, pos):
+            consecutive_text += 1
+            if consecutive_text >= text_limit:
+                break
+
+    anchor_pos = sheet.find(row, col_idx)
+    if anchor_pos is not None:
+        result[anchor] = sheet.output(anchor_pos)
+
     added = 0
-    while current <= max_row and added < 10:
-        addr = f"{column}{current}"
-        if addr in valid:
-            info = valid[addr]
-            result[addr] = info["output"]
-            added += 1
-            if "formula" not in info:
-                try:
-                    float(info["output"])
-                    is_number = True
-                except (ValueError, TypeError):
-                    is_number = False
-                if not is_number:
-                    break
-        current += 1
+    for i in range(split, len(positions)):
+        if added >= 10:
+            break
+        pos = positions[i]
+        if rows[pos] == row or sheet.kinds[pos] == KIND_NONE:
+            continue
+        result[f"{column}{rows[pos]}"] = sheet.output(pos)
+        added += 1
+        if _is_text_output(sheet, pos):
+            break
 
     return result
 
 
-def gather_row_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_limit: int = 3) -> Dict[str, Any]:
+def gather_row_outputs(
+    cells: Union[Dict[str, Dict[str, Any]], SheetCells], anchor: str, text_limit: int = 3
+) -> Dict[str, Any]:
     """Collect output values from cells in the same row as ``anchor``.
 
     The function scans left from ``anchor`` until ``text_limit`` consecutive
@@ -144,8 +234,8 @@ def gather_row_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_limit
     Parameters
     ----------
     cells:
-        Mapping of addresses to dictionaries with at least an ``output`` key and
-        optionally a ``formula`` key.
+        A :class:`SheetCells` store, or a mapping of addresses to dictionaries
+        with at least an ``output`` key and optionally a ``formula`` key.
     anchor:
         Address like ``B10`` that serves as the starting point.
     text_limit:
@@ -158,53 +248,42 @@ def gather_row_outputs(cells: Dict[str, Dict[str, Any]], anchor: str, text_limit
     """
 
     row_idx, col_idx = coordinate_to_tuple(anchor)
+    sheet = _as_sheet(cells, row=row_idx)
 
-    valid = {addr: data for addr, data in cells.items() if data.get("output") is not None}
+    positions = sheet.row_positions(row_idx)
+    cols = sheet.cols
+    split = bisect_left(cols, col_idx, positions.start, positions.stop)
 
     collected: Dict[str, Any] = {}
 
     consecutive_text = 0
-    current = col_idx - 1
     inspected = 0
-    while current >= 1 and inspected < 100:
-        addr = f"{get_column_letter(current)}{row_idx}"
-        if addr in valid:
-            info = valid[addr]
-            collected[addr] = info["output"]
-            inspected += 1
-            if "formula" not in info:
-                try:
-                    float(info["output"])
-                    numeric = True
-                except (ValueError, TypeError):
-                    numeric = False
-                if not numeric:
-                    consecutive_text += 1
-                    if consecutive_text >= text_limit:
-                        break
-        current -= 1
-
-    if anchor in cells:
-        collected[anchor] = cells[anchor].get("output")
-
-    max_col = max((coordinate_to_tuple(a)[1] for a in valid), default=col_idx)
-    current = col_idx + 1
+    for pos in range(split - 1, positions.start - 1, -1):
+        if inspected >= 100:
+            break
+        if sheet.kinds[pos] == KIND_NONE:
+            continue
+        collected[f"{get_column_letter(cols[pos])}{row_idx}"] = sheet.output(pos)
+        inspected += 1
+        if _is_text_output(sheet, pos):
+            consecutive_text += 1
+            if consecutive_text >= text_limit:
+                break
+
+    anchor_pos = sheet.find(row_idx, col_idx)
+    if anchor_pos is not None:
+        collected[anchor] = sheet.output(anchor_pos)
+
     added = 0
-    while current <= max_col and added < 10:
-        addr = f"{get_column_letter(current)}{row_idx}"
-        if addr in valid:
-            info = valid[addr]
-            collected[addr] = info["output"]
-            added += 1
-            if "formula" not in info:
-                try:
-                    float(info["output"])
-                    numeric = True
-                except (ValueError, TypeError):
-                    numeric = False
-                if not numeric:
-                    break
-        current += 1
+    for pos in range(split, positions.stop):
+        if added >= 10:
+            break
+        if cols[pos] == col_idx or sheet.kinds[pos] == KIND_NONE:
+            continue
+        collected[f"{get_column_letter(cols[pos])}{row_idx}"] = sheet.output(pos)
+        added += 1
+        if _is_text_output(sheet, pos):
+            break
 
     return collected
 
@@ -242,12 +321,9 @@ def _filter_row_entries(ws: Worksheet, candidates: Iterable[str], anchor: str, d
     return values
 
 
+@metrics.instrument("utils")
 def refine_header_cells(column_candidates: Iterable[str], row_candidates: Iterable[str], anchor_cell: str, ws: Worksheet, debug: bool = False) -> Tuple[List[Any], List[Any], Any]:
     """Trim header candidates around ``anchor_cell`` and return cell value."""
-    start = perf_counter()
     col_values, cell_val = _filter_column_entries(ws, column_candidates, anchor_cell, debug=debug)
     row_values = _filter_row_entries(ws, row_candidates, anchor_cell, debug=debug)
-    if debug:
-        duration = perf_counter() - start
-        print(f"refine_header_cells completed in {duration:.4f}s")
     return col_values, row_values, cell_val
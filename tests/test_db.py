@@ -0,0 +1,199 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import duckdb
+
+from excel_mcp import db
+
+
+class TestLabelSearch(unittest.TestCase):
+    def setUp(self):
+        db.init_db(":memory:")
+        db.store_label_map("DCF", {
+            "Adj. EBITDA (USD m)": "DCF!C10",
+            "EBIT": "DCF!C12",
+            "WACC": "DCF!C30",
+            "Terminal Growth Rate": "DCF!C31",
+        })
+        db.store_label_map("Inputs", {"wacc": "Inputs!B4"})
+
+    def tearDown(self):
+        db._db_conn = None
+
+    def test_query_label_exact(self):
+        self.assertEqual(db.query_label("WACC"), [("", "DCF", "DCF!C30")])
+
+    def test_search_folds_case_and_punctuation(self):
+        results = db.search_labels("ebitda")
+        self.assertEqual(results[0][:4], ("Adj. EBITDA (USD m)", "", "DCF", "DCF!C10"))
+
+    def test_search_across_sheets(self):
+        results = db.search_labels("Wacc")
+        self.assertEqual({(r[2], r[3]) for r in results}, {("DCF", "DCF!C30"), ("Inputs", "Inputs!B4")})
+
+    def test_search_prefix(self):
+        labels = [r[0] for r in db.search_labels("termin grow")]
+        self.assertEqual(labels, ["Terminal Growth Rate"])
+
+    def test_search_exact_token_ranks_above_prefix(self):
+        labels = [r[0] for r in db.search_labels("ebit")]
+        self.assertEqual(labels[0], "EBIT")
+        self.assertIn("Adj. EBITDA (USD m)", labels)
+
+    def test_search_fuzzy(self):
+        labels = [r[0] for r in db.search_labels("ebidta")]
+        self.assertIn("Adj. EBITDA (USD m)", labels)
+
+    def test_search_reflects_updates(self):
+        db.store_label_map("DCF", {"WACC": "DCF!D30"})
+        results = [(r[0], r[2], r[3]) for r in db.search_labels("wacc")]
+        self.assertIn(("WACC", "DCF", "DCF!D30"), results)
+        self.assertNotIn(("WACC", "DCF", "DCF!C30"), results)
+
+    def test_exact_match_survives_candidate_limit(self):
+        db.init_db(":memory:")
+        db.store_label_map("Scenarios", {f"WACC scenario {i}": f"Scenarios!B{i}" for i in range(400)})
+        db.store_label_map("DCF", {"WACC": "DCF!C30"})
+        for _ in range(2):
+            self.assertEqual(db.search_labels("wacc", 5)[0][0], "WACC")
+            db.rebuild_label_index()
+
+    def test_labels_with_all_tokens_survive_candidate_limit(self):
+        db.init_db(":memory:")
+        db.store_label_map("Scenarios", {f"Cost scenario {i}": f"Scenarios!B{i}" for i in range(300)})
+        db.store_label_map("Inputs", {f"Equity scenario {i}": f"Inputs!B{i}" for i in range(300)})
+        db.store_label_map("DCF", {"Cost of Equity": "DCF!C20"})
+        self.assertEqual(db.search_labels("cost equity", 1)[0][0], "Cost of Equity")
+
+    def test_token_bits_match_sql(self):
+        tokens = ["a", "wacc", "ebitda", "fy2031", "9"]
+        rows = db._db_conn.execute("SELECT token_bit(unnest(?))", (tokens,)).fetchall()
+        self.assertEqual([r[0] for r in rows], [db._token_bit(t) for t in tokens])
+
+    def test_vocab_counts_follow_replaced_labels(self):
+        db.store_label_map("DCF", {"WACC": "DCF!D30", "EBIT": "DCF!D12"})
+        counts = db._db_conn.execute("SELECT * FROM label_vocab ORDER BY token").fetchall()
+        db.rebuild_label_index()
+        self.assertEqual(db._db_conn.execute("SELECT * FROM label_vocab ORDER BY token").fetchall(), counts)
+
+    def test_rebuild_index(self):
+        db.rebuild_label_index()
+        labels = [r[0] for r in db.search_labels("growth")]
+        self.assertEqual(labels, ["Terminal Growth Rate"])
+
+    def test_search_without_database(self):
+        db._db_conn = None
+        self.assertEqual(db.search_labels("wacc"), [])
+
+
+class TestWorkbookCatalog(unittest.TestCase):
+    def setUp(self):
+        db.init_db(":memory:")
+        self.a = db.register_workbook("/models/a.xlsx", "hash-a1")
+        self.b = db.register_workbook("/models/b.xlsx", "hash-b1")
+        db.store_label_map("DCF", {"WACC": "DCF!C30"}, self.a)
+        db.store_label_map("DCF", {"WACC": "DCF!F12"}, self.b)
+
+    def tearDown(self):
+        db._db_conn = None
+
+    def test_same_label_in_different_workbooks(self):
+        self.assertEqual(db.query_label("WACC"), [
+            (os.path.abspath("/models/a.xlsx"), "DCF", "DCF!C30"),
+            (os.path.abspath("/models/b.xlsx"), "DCF", "DCF!F12"),
+        ])
+
+    def test_filter_by_workbook(self):
+        self.assertEqual(db.query_label("WACC", "/models/b.xlsx"), [
+            (os.path.abspath("/models/b.xlsx"), "DCF", "DCF!F12"),
+        ])
+        results = db.search_labels("wacc", workbook="/models/a.xlsx")
+        self.assertEqual([r[3] for r in results], ["DCF!C30"])
+
+    def test_query_several_labels(self):
+        db.store_label_map("Inputs", {"Growth": "Inputs!B3"})
+        rows = db.query_labels(["WACC", "Growth", "Missing"], "/models/a.xlsx")
+        self.assertEqual(rows, [
+            ("Growth", "", "Inputs", "Inputs!B3"),
+            ("WACC", os.path.abspath("/models/a.xlsx"), "DCF", "DCF!C30"),
+        ])
+
+    def test_known_hash_reuses_id(self):
+        self.assertEqual(db.register_workbook("/models/a.xlsx", "hash-a1"), self.a)
+
+    def test_new_hash_creates_latest_version(self):
+        a2 = db.register_workbook("/models/a.xlsx", "hash-a2")
+        db.store_label_map("DCF", {"WACC": "DCF!C31"}, a2)
+        self.assertEqual(db.query_label("WACC", "/models/a.xlsx")[0][2], "DCF!C31")
+        versions = [r[2] for r in db.list_workbooks(all_versions=True) if r[0].endswith("a.xlsx")]
+        self.assertEqual(versions, [1, 2])
+        latest = [r[2] for r in db.list_workbooks() if r[0].endswith("a.xlsx")]
+        self.assertEqual(latest, [2])
+
+    def test_new_version_carries_unscanned_sheets_forward(self):
+        db.store_label_map("Inputs", {"Growth": "Inputs!B3"}, self.a)
+        db.store_workbook_labels("/models/a.xlsx", "hash-a2", {"DCF": {"WACC": "DCF!C31"}})
+        self.assertEqual(db.query_label("Growth", "/models/a.xlsx")[0][2], "Inputs!B3")
+        self.assertEqual(db.query_label("WACC", "/models/a.xlsx")[0][2], "DCF!C31")
+        self.assertEqual([r[0] for r in db.search_labels("growth")], ["Growth"])
+
+    def test_failed_store_rolls_back_version(self):
+        with patch.object(db, "store_label_map", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                db.store_workbook_labels("/models/a.xlsx", "hash-a2", {"DCF": {"WACC": "DCF!C31"}})
+        self.assertIsNone(db.find_workbook("/models/a.xlsx", "hash-a2"))
+        self.assertEqual(db.query_label("WACC", "/models/a.xlsx")[0][2], "DCF!C30")
+
+    def test_failed_block_store_rolls_back_labels(self):
+        blocks = {"DCF": [(0, b"digest", b"rows")]}
+        with patch.object(db, "store_sheet_blocks", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                db.store_workbook_labels("/models/a.xlsx", "hash-a2", {"DCF": {"WACC": "DCF!C31"}}, blocks=blocks)
+        self.assertIsNone(db.find_workbook("/models/a.xlsx", "hash-a2"))
+        self.assertEqual(db.query_label("WACC", "/models/a.xlsx")[0][2], "DCF!C30")
+        workbook_id = db.store_workbook_labels(
+            "/models/a.xlsx", "hash-a2", {"DCF": {"WACC": "DCF!C31"}}, blocks=blocks
+        )
+        self.assertEqual(db.load_sheet_blocks(workbook_id), {"DCF": {0: (b"digest", b"rows")}})
+
+
+class TestLegacySchema(unittest.TestCase):
+    def test_migrates_label_table_without_workbook(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "legacy.db")
+            conn = duckdb.connect(path)
+            conn.execute(
+                "CREATE TABLE cell_labels(label TEXT, sheet_name TEXT, cell_address TEXT, "
+                "last_updated TIMESTAMP, PRIMARY KEY(label, sheet_name))"
+            )
+            conn.execute("INSERT INTO cell_labels VALUES ('WACC', 'DCF', 'DCF!C30', now())")
+            conn.close()
+
+            db.init_db(path)
+            try:
+                self.assertEqual(db.query_label("WACC"), [("", "DCF", "DCF!C30")])
+                self.assertEqual(db.search_labels("wacc")[0][3], "DCF!C30")
+            finally:
+                db._db_conn.close()
+                db._db_conn = None
+
+    def test_reindexes_label_tokens_without_masks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tokens.db")
+            db.init_db(path)
+            db.store_label_map("DCF", {"Cost of Equity": "DCF!C20"})
+            db._db_conn.execute("ALTER TABLE label_tokens DROP COLUMN token_mask")
+            db._db_conn.close()
+
+            db.init_db(path)
+            try:
+                self.assertEqual(db.search_labels("cost equity")[0][3], "DCF!C20")
+            finally:
+                db._db_conn.close()
+                db._db_conn = None
+
+
+if __name__ == "__main__":
+    unittest.main()
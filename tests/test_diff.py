@@ -0,0 +1,290 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from importlib import import_module
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.workbook.defined_name import DefinedName
+
+from excel_mcp import db
+from excel_mcp.diff import XlsxPackage, _add_defined_names, _SheetScan, diff_files, translate_formula
+from excel_mcp.offline import build_workbook_label_maps
+
+server_mod = import_module('excel_mcp.server')
+
+
+def _model():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "DCF"
+    ws["A1"] = "Revenue"
+    ws["B1"] = 100
+    ws["A2"] = "Growth"
+    ws["B2"] = 0.05
+    ws["A3"] = "Next Revenue"
+    ws["B3"] = "=B1*(1+B2)"
+    ws["A4"] = "Total"
+    ws["B4"] = "=SUM(B1:B3)"
+    ws["D1"] = "Tax Rate"
+    ws["D2"] = 0.25
+    summary = wb.create_sheet("Summary Sheet")
+    summary["A1"] = "Value"
+    summary["B1"] = "=DCF!B4*2"
+    summary["A2"] = "Note"
+    summary["B2"] = '="B1 is not a reference"'
+    wb.defined_names["TaxRate"] = DefinedName("TaxRate", attr_text="DCF!$D$2")
+    return wb
+
+
+# Minimal package as Excel writes it: shared strings, a shared formula
+# and a cell without a reference.
+_WORKBOOK_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0"?><workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+        '<sheet name="Calc" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+    ),
+}
+
+
+def _write_package(path, strings, rows):
+    sst = "".join(f"<si><t>{s}</t></si>" for s in strings)
+    sheet = "".join(f'<row r="{r}">{cells}</row>' for r, cells in rows)
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in _WORKBOOK_PARTS.items():
+            zf.writestr(name, data)
+        zf.writestr(
+            "xl/sharedStrings.xml",
+            '<?xml version="1.0"?><sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"{sst}</sst>",
+        )
+        zf.writestr(
+            "xl/worksheets/sheet1.xml",
+            '<?xml version="1.0"?><worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"<sheetData>{sheet}</sheetData></worksheet>",
+        )
+
+
+class TestWorkbookDiff(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.old = os.path.join(tmp.name, "v1.xlsx")
+        self.new = os.path.join(tmp.name, "v2.xlsx")
+
+    def test_identical_files(self):
+        _model().save(self.old)
+        _model().save(self.new)
+        report = diff_files(self.old, self.new)
+        self.assertEqual(report["blocks_changed"], 0)
+        self.assertEqual(report["changes"], [])
+        self.assertEqual(report["labels"], [])
+        self.assertEqual(report["dependents"], [])
+
+    def test_changes_and_dependents(self):
+        _model().save(self.old)
+        wb = _model()
+        wb["DCF"]["B2"] = 0.07
+        wb["DCF"]["B3"] = "=B1*(1+B2)+1"
+        wb["DCF"]["C5"] = 1
+        wb["DCF"]["D2"] = None
+        wb.save(self.new)
+        report = diff_files(self.old, self.new)
+        changes = {(c["address"], c["change"]) for c in report["changes"]}
+        self.assertEqual(changes, {("B2", "value"), ("B3", "formula"), ("C5", "added"), ("D2", "removed")})
+        formula = next(c for c in report["changes"] if c["change"] == "formula")
+        self.assertEqual(formula["old"]["formula"], "=B1*(1+B2)")
+        self.assertEqual(formula["new"]["formula"], "=B1*(1+B2)+1")
+        self.assertEqual(report["counts"], {"formula": 1, "value": 1, "added": 1, "removed": 1})
+        # B4 sums a range containing B2 and B3; the summary reads B4 across
+        # sheets; the quoted string in Summary!B2 is not a reference.
+        self.assertEqual(report["dependents"], ["DCF!B4", "Summary Sheet!B1"])
+        self.assertFalse(report["dependents_truncated"])
+
+    def test_last_column_dependents(self):
+        wb = _model()
+        wb["DCF"]["XFD1"] = 1
+        wb["DCF"]["XFD2"] = "=XFD1*2"
+        wb["DCF"]["C2"] = "=XFD2+1"
+        wb.save(self.old)
+        wb["DCF"]["XFD1"] = 2
+        wb.save(self.new)
+        report = diff_files(self.old, self.new)
+        self.assertEqual([c["address"] for c in report["changes"]], ["XFD1"])
+        self.assertEqual(report["dependents"], ["DCF!C2", "DCF!XFD2"])
+
+    def test_defined_name_dependents(self):
+        wb = _model()
+        wb["DCF"]["E1"] = "=B4*(1-taxrate)"
+        wb["Summary Sheet"]["B3"] = "=SUM(Rates)"
+        wb["Summary Sheet"]["B4"] = '="TaxRate"'
+        wb.defined_names["Rates"] = DefinedName("Rates", attr_text="DCF!$D$1:$D$3")
+        wb.save(self.old)
+        wb["DCF"]["D2"] = 0.3
+        wb.save(self.new)
+        report = diff_files(self.old, self.new)
+        self.assertEqual(report["dependents"], ["DCF!E1", "Summary Sheet!B3"])
+
+    def test_label_changes(self):
+        _model().save(self.old)
+        wb = _model()
+        ws = wb["DCF"]
+        ws["A2"] = None
+        ws["A6"] = "Growth"
+        ws["B6"] = 0.1
+        wb.defined_names["TaxRate"] = DefinedName("TaxRate", attr_text="DCF!$B$6")
+        wb.save(self.new)
+        labels = {(c["label"], c["old"], c["new"]) for c in diff_files(self.old, self.new)["labels"]}
+        self.assertEqual(labels, {("Growth", "DCF!B2", "DCF!B6"), ("TaxRate", "DCF!D2", "DCF!B6")})
+
+    def test_label_maps_match_offline_scan(self):
+        wb = _model()
+        wb.save(self.old)
+        with XlsxPackage(self.old) as pkg:
+            maps = {}
+            for sheet in pkg.sheets:
+                scan = _SheetScan(pkg, sheet)
+                for _ in scan.blocks():
+                    pass
+                maps[sheet] = scan.labels
+            _add_defined_names(pkg, maps)
+        self.assertEqual(maps, build_workbook_label_maps(load_workbook(self.old)))
+
+    def test_unchanged_blocks_are_skipped(self):
+        wb = Workbook()
+        ws = wb.active
+        for r in range(1, 1001):
+            ws.append([f"Line {r}", r, f"=B{r}*2"])
+        ws["D1"] = "=SUM(C1:C1000)"
+        wb.save(self.old)
+        ws["B700"] = -1
+        ws["C1001"] = "=SUM(C1:C1000)"
+        wb.save(self.new)
+        report = diff_files(self.old, self.new, max_changes=1)
+        self.assertEqual(report["blocks_changed"], 2)
+        self.assertEqual(report["counts"], {"formula": 0, "value": 1, "added": 1, "removed": 0})
+        self.assertEqual(len(report["changes"]), 1)
+        self.assertTrue(report["changes_truncated"])
+        # The added C1001 depends on C700 too but is reported as a change.
+        self.assertEqual(report["dependents"], ["Sheet!C700", "Sheet!D1"])
+
+    def test_dependent_limit(self):
+        wb = Workbook()
+        ws = wb.active
+        ws["A1"] = 1
+        for r in range(2, 50):
+            ws[f"A{r}"] = f"=A{r - 1}+1"
+        wb.save(self.old)
+        ws["A1"] = 2
+        wb.save(self.new)
+        report = diff_files(self.old, self.new, max_dependents=10)
+        self.assertEqual(len(report["dependents"]), 10)
+        self.assertTrue(report["dependents_truncated"])
+
+    def test_shared_strings_and_formulas(self):
+        rows = [
+            (1, '<c r="A1" t="s"><v>0</v></c><c r="B1"><v>2</v></c>'),
+            (2, '<c r="A2" t="s"><v>1</v></c><c r="B2"><f t="shared" ref="B2:B3" si="0">B1*2</f><v>4</v></c>'),
+            (3, '<c t="s"><v>2</v></c><c><f t="shared" si="0"/><v>8</v></c>'),
+        ]
+        _write_package(self.old, ["Base", "Double", "Quad"], rows)
+        # A new string shifts every index but not the contents.
+        new_rows = [
+            (1, '<c r="A1" t="s"><v>1</v></c><c r="B1"><v>3</v></c>'),
+            (2, '<c r="A2" t="s"><v>2</v></c><c r="B2"><f t="shared" ref="B2:B3" si="0">B1*3</f><v>9</v></c>'),
+            (3, '<c t="s"><v>3</v></c><c><f t="shared" si="0"/><v>27</v></c>'),
+            (4, '<c r="A4" t="s"><v>0</v></c>'),
+        ]
+        _write_package(self.new, ["Added", "Base", "Double", "Quad"], new_rows)
+        report = diff_files(self.old, self.new)
+        changes = {(c["address"], c["change"]): c for c in report["changes"]}
+        self.assertEqual(
+            set(changes), {("B1", "value"), ("B2", "formula"), ("B3", "formula"), ("A4", "added")}
+        )
+        self.assertEqual(changes[("B3", "formula")]["new"]["formula"], "=B2*3")
+        self.assertEqual(changes[("B3", "formula")]["new"]["value"], 27)
+        self.assertEqual(report["labels"], [])
+
+    def test_string_index_shift_is_not_a_change(self):
+        rows = [(1, '<c r="A1" t="s"><v>0</v></c><c r="B1" s="1"><v>2</v></c>')]
+        _write_package(self.old, ["Base"], rows)
+        rows = [(1, '<c r="A1" t="s"><v>1</v></c><c r="B1" s="2"><v>2</v></c>')]
+        _write_package(self.new, ["Unused", "Base"], rows)
+        self.assertEqual(diff_files(self.old, self.new)["blocks_changed"], 0)
+
+    def test_translate_formula(self):
+        self.assertEqual(translate_formula("=SUM(A1:$B$2)+Sheet2!C$3", 2, 1), "=SUM(B3:$B$2)+Sheet2!D$3")
+        self.assertEqual(translate_formula('=IF(A1>0,"A1",C:C)', 1, 1), '=IF(B2>0,"A1",D:D)')
+
+
+class TestDiffTools(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "model.xlsx")
+        db.init_db(":memory:")
+        self.addCleanup(setattr, db, "_db_conn", None)
+
+    def test_snapshot_then_diff(self):
+        _model().save(self.path)
+        result = server_mod.snapshot_workbook.fn(self.path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["version"], 1)
+        self.assertEqual(result["sheets"], {"DCF": 1, "Summary Sheet": 1})
+
+        wb = _model()
+        wb["DCF"]["B1"] = 120
+        wb["DCF"]["A1"] = "Sales"
+        wb.save(self.path)
+        result = server_mod.diff_workbooks.fn(self.path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["old_version"], 1)
+        # Snapshots keep digests only, so the whole changed row is reported.
+        self.assertEqual({c["address"] for c in result["changes"]}, {"A1", "B1", "D1"})
+        self.assertEqual(result["counts"], {"formula": 0, "value": 0, "added": 0, "removed": 0, "row": 3})
+        self.assertEqual(
+            {(c["label"], c["old"], c["new"]) for c in result["labels"]},
+            {("Revenue", "DCF!B1", None), ("Sales", None, "DCF!B1")},
+        )
+        self.assertEqual(result["dependents"], ["DCF!B3", "DCF!B4", "Summary Sheet!B1"])
+
+        server_mod.snapshot_workbook.fn(self.path)
+        result = server_mod.diff_workbooks.fn(self.path, old_version=1)
+        self.assertEqual(result["old_version"], 1)
+        self.assertEqual(server_mod.diff_workbooks.fn(self.path)["old_version"], 1)
+
+    def test_diff_files_tool(self):
+        _model().save(self.path)
+        new = os.path.join(os.path.dirname(self.path), "v2.xlsx")
+        wb = _model()
+        wb["DCF"]["B2"] = 0.06
+        wb.save(new)
+        result = server_mod.diff_workbooks.fn(new, old_path=self.path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["changes"][0]["old"]["value"], 0.05)
+
+    def test_diff_without_snapshot(self):
+        _model().save(self.path)
+        result = server_mod.diff_workbooks.fn(self.path)
+        self.assertEqual(result["status"], "failure")
+        self.assertIn("no snapshot", result["reason"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import unittest
+from decimal import Decimal
+from importlib import import_module
+from unittest.mock import patch
+
+from benchmarks.fake_excel import FakeExcel, dcf_workbook
+from excel_mcp import db, metrics
+
+server_mod = import_module('excel_mcp.server')
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        metrics.enable(log=False)
+        self.addCleanup(metrics.disable)
+        self.addCleanup(metrics.reset)
+
+    def test_disabled_records_nothing(self):
+        metrics.disable()
+        traced = metrics.instrument("db")(lambda: 1)
+        self.assertEqual(traced(), 1)
+        metrics.count("db.rows_written", 5)
+        snap = metrics.snapshot()
+        self.assertEqual(snap["latency_ms"], {})
+        self.assertEqual(snap["counters"], {})
+        self.assertIsNone(metrics.com_proxy(None))
+        app = object()
+        self.assertIs(metrics.com_proxy(app), app)
+
+    def test_histogram_buckets(self):
+        hist = metrics.Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50, 500):
+            hist.observe(value)
+        data = hist.to_dict()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["buckets"], {"<=1": 1, "<=10": 2, "<=100": 1, ">100": 1})
+        self.assertEqual(data["p50"], 10)
+        self.assertEqual(data["max"], 500)
+
+    def test_tool_latency_payload_and_com_calls(self):
+        app = FakeExcel(dcf_workbook(years=3, line_items=1))
+        with patch.object(server_mod, "win32", object()), \
+                patch.object(server_mod, "excel_app", metrics.com_proxy(app)):
+            result = server_mod.trace_precedents.fn("DCF", "C12")
+        self.assertEqual(result["status"], "success")
+
+        snap = server_mod.get_server_metrics.fn()
+        self.assertEqual(snap["latency_ms"]["tool.trace_precedents"]["count"], 1)
+        self.assertEqual(
+            snap["payload_bytes"]["tool.trace_precedents"]["total"], len(json.dumps(result))
+        )
+        self.assertGreater(snap["com"]["calls"], 0)
+        self.assertIn("Precedents", snap["com"]["attributes"])
+
+    def test_proxy_arguments_are_unwrapped(self):
+        class Com:
+            _oleobj_ = None
+
+            def Range(self, first, last=None):
+                return ("range", first, last)
+
+        class Cell:
+            _oleobj_ = None
+
+        app = metrics.com_proxy(Com())
+        first, last = metrics.com_proxy(Cell()), metrics.com_proxy(Cell())
+        result = app.Range(first, last=last)
+        self.assertIs(result[1], metrics.unwrap(first))
+        self.assertIs(result[2], metrics.unwrap(last))
+
+    def test_proxy_passes_plain_values_through(self):
+        class Cell:
+            _oleobj_ = None
+            Value = Decimal("12.5")
+            Formula = "=A1"
+
+        cell = metrics.com_proxy(Cell())
+        self.assertIsInstance(cell.Value, Decimal)
+        self.assertEqual(cell.Formula, "=A1")
+        self.assertEqual(json.dumps({"value": float(cell.Value)}), '{"value": 12.5}')
+        self.assertEqual(metrics.snapshot()["com"]["attributes"], {"Value": 2, "Formula": 1})
+
+    def test_failures_are_counted(self):
+        with patch.object(server_mod, "win32", None):
+            server_mod.get_formula.fn(None, "A1")
+        self.assertEqual(metrics.snapshot()["errors"], {"tool.get_formula": 1})
+
+    def test_db_rows_written(self):
+        db.init_db(":memory:")
+        self.addCleanup(setattr, db, "_db_conn", None)
+        db.store_label_map("DCF", {"WACC": "DCF!C30", "EBIT": "DCF!C12"})
+        snap = metrics.snapshot()
+        self.assertEqual(snap["counters"]["db.rows_written"], 2)
+        self.assertEqual(snap["latency_ms"]["db.store_label_map"]["count"], 1)
+
+    def test_reset_through_tool(self):
+        metrics.count("db.rows_written")
+        server_mod.get_server_metrics.fn(reset=True)
+        self.assertEqual(metrics.snapshot()["counters"], {})
+
+    def test_structured_log(self):
+        metrics.enable(log=True)
+        traced = metrics.instrument("tool")(lambda: {"status": "success"})
+        with self.assertLogs("excel_mcp.metrics", level="INFO") as logs:
+            traced()
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["event"], "tool")
+        self.assertEqual(record["status"], "success")
+
+    def test_every_tool_is_instrumented(self):
+        tools = asyncio.run(server_mod.server.get_tools())
+        for name, tool in tools.items():
+            if name == "get_server_metrics":
+                continue
+            self.assertTrue(hasattr(tool.fn, "__wrapped__"), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+import os
+import tempfile
+import unittest
+from importlib import import_module
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.workbook.defined_name import DefinedName
+
+from excel_mcp import db
+from excel_mcp.offline import (
+    build_sheet_label_map,
+    build_workbook_label_maps,
+    scan_workbooks,
+    stream_column_outputs,
+    stream_row_outputs,
+)
+from excel_mcp.utils import collect_column_outputs, gather_row_outputs
+
+server_mod = import_module('excel_mcp.server')
+
+
+def _make_model(path, wacc_row=2):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "DCF"
+    ws["A1"] = "Revenue"
+    ws["B1"] = 100
+    ws[f"A{wacc_row}"] = "WACC"
+    ws[f"B{wacc_row}"] = "=0.08"
+    wb.defined_names["TaxRate"] = DefinedName("TaxRate", attr_text="DCF!$H$9")
+    wb.save(path)
+    return wb
+
+
+class TestOfflineLabelMap(unittest.TestCase):
+    def test_right_then_below(self):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "DCF"
+        ws["A1"] = "Revenue"
+        ws["B1"] = 100
+        ws["A2"] = "WACC"
+        ws["B2"] = "=0.08"
+        ws["D1"] = "Growth"
+        ws["D2"] = 0.02
+        ws["F1"] = "Notes"
+        ws["G1"] = "n/a"
+        self.assertEqual(build_sheet_label_map(ws), {
+            "Revenue": "DCF!B1",
+            "WACC": "DCF!B2",
+            "Growth": "DCF!D2",
+        })
+
+    def test_defined_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wb = _make_model(os.path.join(tmp, "m.xlsx"))
+            maps = build_workbook_label_maps(wb)
+            self.assertEqual(maps["DCF"]["TaxRate"], "DCF!H9")
+
+
+class TestStreamingScan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "big.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "DCF"
+        for r in range(1, 40):
+            ws.cell(r, 1, f"Line {r}")
+            ws.cell(r, 2, r * 10)
+            ws.cell(r, 3, f"=B{r}*2")
+        ws["E5"] = "Header"
+        ws["E6"] = 7
+        ws["A41"] = "Total"
+        ws["A42"] = "=SUM(B1:B39)"
+        wb.save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_only_matches_normal_mode(self):
+        normal = build_sheet_label_map(load_workbook(self.path)["DCF"])
+        wb = load_workbook(self.path, read_only=True)
+        try:
+            streamed = build_sheet_label_map(wb["DCF"])
+        finally:
+            wb.close()
+        self.assertEqual(streamed, normal)
+        self.assertEqual(streamed["Line 3"], "DCF!B3")
+        self.assertEqual(streamed["Header"], "DCF!E6")
+        self.assertEqual(streamed["Total"], "DCF!A42")
+
+    def test_scan_range_sees_neighbours_outside_range(self):
+        wb = load_workbook(self.path, read_only=True)
+        try:
+            label_map = build_sheet_label_map(wb["DCF"], "A1:A2")
+        finally:
+            wb.close()
+        self.assertEqual(label_map, {"Line 1": "DCF!B1", "Line 2": "DCF!B2"})
+
+    def test_stream_column_matches_in_memory(self):
+        wb = load_workbook(self.path)
+        cells = {
+            c.coordinate: ({"output": c.value, "formula": c.value} if c.data_type == "f" else {"output": c.value})
+            for row in wb["DCF"].iter_rows()
+            for c in row
+            if c.value is not None
+        }
+        self.assertEqual(
+            stream_column_outputs(self.path, "DCF", "B20", text_limit=1),
+            collect_column_outputs(cells, "B20", text_limit=1),
+        )
+        self.assertEqual(
+            stream_row_outputs(self.path, "DCF", "B20", text_limit=1),
+            gather_row_outputs(cells, "B20", text_limit=1),
+        )
+
+    def test_build_label_address_map_from_file(self):
+        result = server_mod.build_label_address_map.fn("DCF", workbook_path=self.path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["label_map"]["Line 39"], "DCF!B39")
+
+    def test_gather_cell_outputs_tool(self):
+        result = server_mod.gather_cell_outputs.fn(self.path, "DCF", "C5", axis="row")
+        self.assertEqual(result["outputs"], {"A5": "Line 5", "B5": 50, "C5": "=B5*2", "E5": "Header"})
+        result = server_mod.gather_cell_outputs.fn(self.path, "DCF", "C5", axis="diagonal")
+        self.assertEqual(result["status"], "failure")
+
+
+class TestOfflineInputs(unittest.TestCase):
+    def test_set_inputs_in_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.xlsx")
+            out = os.path.join(tmp, "out.xlsx")
+            _make_model(path)
+            result = server_mod.set_inputs.fn(
+                {"Revenue": 250, "C1": 5}, ["WACC", "B1"], workbook_path=path, save_path=out
+            )
+            self.assertEqual(result["status"], "success")
+            self.assertFalse(result["recalculated"])
+            self.assertEqual(result["outputs"], {"WACC": "=0.08", "B1": 250})
+
+            wb = load_workbook(out)
+            self.assertEqual(wb["DCF"]["B1"].value, 250)
+            self.assertEqual(wb["DCF"]["C1"].value, 5)
+            self.assertTrue(wb.calculation.fullCalcOnLoad)
+            self.assertEqual(load_workbook(path)["DCF"]["B1"].value, 100)
+
+    def test_set_inputs_keeps_original(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.xlsx")
+            _make_model(path)
+            first = server_mod.set_inputs.fn({"Revenue": 250}, workbook_path=path)
+            second = server_mod.set_inputs.fn({"Revenue": 300}, workbook_path=path)
+            self.assertEqual(first["saved_path"], os.path.join(tmp, "m.inputs.xlsx"))
+            self.assertEqual(second["saved_path"], os.path.join(tmp, "m.inputs-2.xlsx"))
+            self.assertEqual(load_workbook(path)["DCF"]["B1"].value, 100)
+            self.assertEqual(load_workbook(first["saved_path"])["DCF"]["B1"].value, 250)
+
+    def test_set_inputs_address_like_label(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.xlsx")
+            wb = _make_model(path)
+            wb["DCF"]["A4"] = "FY2025"
+            wb["DCF"]["B4"] = 7
+            wb.save(path)
+            result = server_mod.set_inputs.fn({"FY2025": 5}, workbook_path=path)
+            self.assertEqual(result["status"], "failure")
+            self.assertIn("ambiguous cells: FY2025", result["reason"])
+            result = server_mod.set_inputs.fn({"$B$4": 5, "DCF!FY2025": 6}, workbook_path=path)
+            self.assertEqual(result["status"], "success")
+            ws = load_workbook(result["saved_path"])["DCF"]
+            self.assertEqual((ws["B4"].value, ws["FY2025"].value), (5, 6))
+
+    def test_set_inputs_unknown_label(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.xlsx")
+            _make_model(path)
+            result = server_mod.set_inputs.fn({"Capex": 1}, workbook_path=path)
+            self.assertEqual(result["status"], "failure")
+
+
+class TestCatalogWorkbooks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        _make_model(os.path.join(self.tmp.name, "a.xlsx"))
+        _make_model(os.path.join(self.tmp.name, "b.xlsx"), wacc_row=5)
+        with open(os.path.join(self.tmp.name, "broken.xlsx"), "w") as fh:
+            fh.write("not a workbook")
+        db.init_db(":memory:")
+
+    def tearDown(self):
+        db._db_conn = None
+        self.tmp.cleanup()
+
+    def test_scan_reports_errors(self):
+        paths = sorted(os.path.join(self.tmp.name, p) for p in os.listdir(self.tmp.name))
+        results = list(scan_workbooks(paths, workers=2))
+        self.assertEqual([r["path"] for r in results], paths)
+        self.assertIn("error", results[2])
+
+    def test_catalog_directory(self):
+        result = server_mod.catalog_workbooks.fn(self.tmp.name, workers=1)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["cataloged"], 2)
+        self.assertEqual(len(result["errors"]), 1)
+
+        rows = db.query_label("WACC")
+        self.assertEqual([(os.path.basename(r[0]), r[2]) for r in rows], [
+            ("a.xlsx", "DCF!B2"),
+            ("b.xlsx", "DCF!B5"),
+        ])
+
+        again = server_mod.catalog_workbooks.fn(self.tmp.name, workers=1)
+        self.assertEqual((again["cataloged"], again["unchanged"]), (0, 2))
+
+    def test_remap_after_edit_keeps_other_sheets(self):
+        path = os.path.join(self.tmp.name, "a.xlsx")
+        wb = load_workbook(path)
+        ws = wb.create_sheet("Inputs")
+        ws["A1"], ws["B1"] = "Growth", 0.05
+        wb.save(path)
+        server_mod.build_label_address_map.fn("DCF", workbook_path=path)
+        server_mod.build_label_address_map.fn("Inputs", workbook_path=path)
+        wb["Inputs"]["B1"] = 0.06
+        wb.save(path)
+        server_mod.build_label_address_map.fn("Inputs", workbook_path=path)
+        self.assertEqual(db.query_label("WACC", path)[0][2], "DCF!B2")
+
+        # A partially mapped version is scanned again by the catalog.
+        result = server_mod.catalog_workbooks.fn(self.tmp.name, workers=1)
+        self.assertEqual((result["cataloged"], result["unchanged"]), (2, 0))
+
+    def test_deleted_sheet_leaves_latest_version(self):
+        path = os.path.join(self.tmp.name, "a.xlsx")
+        wb = load_workbook(path)
+        ws = wb.create_sheet("Old")
+        ws["A1"], ws["B1"] = "Legacy", 1
+        wb.save(path)
+        server_mod.catalog_workbooks.fn(self.tmp.name, workers=1)
+        self.assertEqual(db.query_label("Legacy", path)[0][2], "Old!B1")
+        del wb["Old"]
+        wb.save(path)
+        server_mod.catalog_workbooks.fn(self.tmp.name, workers=1)
+        self.assertEqual(db.query_label("Legacy", path), [])
+        self.assertEqual(db.query_label("WACC", path)[0][2], "DCF!B2")
+
+    def test_catalog_requires_database(self):
+        db._db_conn = None
+        result = server_mod.catalog_workbooks.fn(self.tmp.name)
+        self.assertEqual(result["status"], "failure")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -53,5 +53,88 @@ class TestServerTools(unittest.TestCase):
             self.assertEqual(result["status"], "failure")
 
 
+class TestToolsWithFakeExcel(unittest.TestCase):
+    def setUp(self):
+        from benchmarks.fake_excel import FakeExcel, dcf_workbook
+
+        self.app = FakeExcel(dcf_workbook(years=3, line_items=1))
+        patches = [patch.object(server_mod, "win32", object()), patch.object(server_mod, "excel_app", self.app)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_build_label_address_map(self):
+        result = server_mod.build_label_address_map.fn("DCF")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["label_map"]["WACC"], "DCF!B6")
+        self.assertEqual(result["label_map"]["Revenue"], "DCF!B10")
+        self.assertEqual(result["label_map"]["TaxRate"], "DCF!B5")
+
+    def test_trace_precedents_follows_chain(self):
+        result = server_mod.trace_precedents.fn("DCF", "C12")
+        self.assertEqual(result["status"], "success")
+        self.assertIn("DCF!B3", result["precedents"])
+        self.assertIn("DCF!B10", result["precedents"])
+
+    def test_find_cell_labels(self):
+        result = server_mod.find_cell_labels.fn("DCF", "B6")
+        self.assertIn("WACC", result["labels"])
+        self.assertGreater(self.app.com_calls, 0)
+
+    def test_set_inputs_recalculates_once(self):
+        self.app.reset_counters()
+        result = server_mod.set_inputs.fn(
+            {"B3": 0.1, "B4": 0.4, "DCF!B5": 0.2, "D9": 2030}, ["D10", "B14"]
+        )
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["writes"], 2)
+        self.assertEqual(self.app.recalcs, 1)
+        self.assertAlmostEqual(result["outputs"]["D10"], 1210.0)
+        self.assertAlmostEqual(result["outputs"]["B14"], (1000 * 0.4 - 10) * 0.8)
+        self.assertEqual(self.app._calculation, -4105)
+        self.assertTrue(self.app._screen_updating)
+        self.assertTrue(self.app._enable_events)
+
+    def test_set_inputs_restores_state_when_switch_fails(self):
+        def set_calculation(app, mode):
+            if mode == -4135:
+                raise RuntimeError("Calculation is read-only")
+            app._calculation = mode
+
+        calculation = property(lambda app: app._calculation, set_calculation)
+        with patch.object(type(self.app), "Calculation", calculation):
+            result = server_mod.set_inputs.fn({"B3": 0.1})
+        self.assertEqual(result["status"], "failure")
+        self.assertTrue(self.app._screen_updating)
+        self.assertTrue(self.app._enable_events)
+
+    def test_set_inputs_by_label(self):
+        from excel_mcp import db
+
+        db.init_db(":memory:")
+        self.addCleanup(setattr, db, "_db_conn", None)
+        server_mod.build_label_address_map.fn("DCF")
+        result = server_mod.set_inputs.fn({"Revenue Growth": 0.1}, ["Revenue"])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.app._workbook._sheets["DCF"].cells[(3, 2)][0], 0.1)
+
+    def test_set_inputs_label_on_several_sheets(self):
+        from excel_mcp import db
+
+        db.init_db(":memory:")
+        self.addCleanup(setattr, db, "_db_conn", None)
+        db.store_label_map("DCF", {"Growth": "DCF!B3"})
+        db.store_label_map("Inputs", {"Growth": "Inputs!C7"})
+        result = server_mod.set_inputs.fn({"Growth": 0.1})
+        self.assertEqual(result["status"], "failure")
+        self.assertIn("ambiguous cells: Growth", result["reason"])
+        self.assertEqual(self.app.recalcs, 0)
+
+    def test_set_inputs_unresolved_label(self):
+        result = server_mod.set_inputs.fn({"No Such Label": 1})
+        self.assertEqual(result["status"], "failure")
+        self.assertEqual(self.app.recalcs, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
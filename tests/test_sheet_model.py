@@ -0,0 +1,62 @@
+import unittest
+
+from excel_mcp.sheet_model import SheetCells
+from excel_mcp.utils import collect_column_outputs, gather_row_outputs
+
+
+class TestSheetCells(unittest.TestCase):
+    def setUp(self):
+        self.cells = {
+            "A1": {"output": "Revenue"},
+            "B1": {"output": 100},
+            "C1": {"output": 110.5, "formula": "=B1*1.105"},
+            "A2": {"output": "Flag"},
+            "B2": {"output": True},
+            "C2": {"output": None, "formula": "=B1*1.105"},
+        }
+
+    def test_round_trip(self):
+        sheet = SheetCells.from_cells(self.cells)
+        self.assertEqual(len(sheet), 6)
+        self.assertEqual(sheet.to_cells(), self.cells)
+
+    def test_typed_values(self):
+        sheet = SheetCells.from_cells(self.cells)
+        self.assertIs(type(sheet.output(sheet.find(1, 2))), int)
+        self.assertIs(sheet.output(sheet.find(2, 2)), True)
+        self.assertIsNone(sheet.find(3, 1))
+
+    def test_formulas_are_interned(self):
+        sheet = SheetCells.from_cells(self.cells)
+        self.assertEqual(len(sheet._formulas), 1)
+        self.assertEqual(sheet.formula(sheet.find(2, 3)), "=B1*1.105")
+        self.assertIsNone(sheet.formula(sheet.find(1, 1)))
+
+    def test_out_of_order_appends(self):
+        sheet = SheetCells("S")
+        sheet.append(3, 1, "c")
+        sheet.append(1, 2, "a")
+        sheet.append(1, 1, "b")
+        self.assertEqual([(r, c) for r, c, _, _ in sheet], [(1, 1), (1, 2), (3, 1)])
+        self.assertEqual(list(sheet.column_positions(1)), [0, 2])
+        self.assertEqual(sheet.address(sheet.find(3, 1)), "A3")
+
+    def test_last_column(self):
+        sheet = SheetCells("S")
+        sheet.append(1, 16384, "xfd")
+        sheet.append(2, 1, "a")
+        sheet.append(1, 16383, "xfc")
+        self.assertEqual([(r, c) for r, c, _, _ in sheet], [(1, 16383), (1, 16384), (2, 1)])
+        self.assertEqual(sheet.address(sheet.find(1, 16384)), "XFD1")
+
+    def test_helpers_accept_sheet_cells(self):
+        sheet = SheetCells.from_cells(self.cells)
+        self.assertEqual(collect_column_outputs(sheet, "B2"), collect_column_outputs(self.cells, "B2"))
+        self.assertEqual(gather_row_outputs(sheet, "B1"), gather_row_outputs(self.cells, "B1"))
+
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(SheetCells(), "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+import unittest
+from importlib import import_module
+from unittest.mock import patch
+
+from benchmarks.bench_import_time import importtime
+
+server_mod = import_module('excel_mcp.server')
+
+LAZY = ("duckdb", "openpyxl", "win32com", "pythoncom", "excel_mcp.offline", "excel_mcp.utils")
+
+
+class TestStartup(unittest.TestCase):
+    def test_server_import_defers_heavy_dependencies(self):
+        times = importtime("import excel_mcp.server")
+        self.assertIn("excel_mcp.server", times)
+        for name in LAZY:
+            self.assertNotIn(name, times)
+
+    def test_package_import_does_not_start_fastmcp(self):
+        times = importtime("import excel_mcp.db")
+        self.assertNotIn("fastmcp", times)
+        self.assertNotIn("duckdb", times)
+
+    def test_dependencies_load_on_first_use(self):
+        code = (
+            "import sys\n"
+            "from importlib import import_module\n"
+            "s = import_module('excel_mcp.server')\n"
+            "s.initialize_database.fn(':memory:')\n"
+            "s.get_formula.fn(None, 'A1')\n"
+            "print(' '.join(m for m in ('duckdb', 'pythoncom') if m in sys.modules))\n"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(proc.stdout.split(), ["duckdb"])
+
+    def test_package_exposes_server_instance(self):
+        import excel_mcp
+
+        self.assertIs(excel_mcp.server, server_mod.server)
+
+    def test_transport_argument(self):
+        with patch.object(type(server_mod.server), "run") as run:
+            server_mod.main(["--transport", "stdio"])
+            run.assert_called_once_with(transport="stdio")
+        with patch.object(type(server_mod.server), "run") as run:
+            server_mod.main([])
+            run.assert_called_once_with(transport="streamable-http")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,8 @@ from excel_mcp.utils import (
     address_within_ranges,
     collect_column_outputs,
     gather_row_outputs,
+    group_contiguous_cells,
+    parse_cell_reference,
     refine_header_cells,
 )
 from openpyxl import Workbook
@@ -22,6 +24,22 @@ class TestAddressWithinRanges(unittest.TestCase):
         self.assertFalse(address_within_ranges("Sheet2!A1", ranges))
 
 
+class TestCellGrouping(unittest.TestCase):
+    def test_parse_cell_reference(self):
+        self.assertEqual(parse_cell_reference("B5"), (None, 5, 2))
+        self.assertEqual(parse_cell_reference("'My Sheet'!$AA$10"), ("My Sheet", 10, 27))
+        self.assertIsNone(parse_cell_reference("Revenue Growth"))
+        self.assertIsNone(parse_cell_reference("WACC"))
+
+    def test_group_contiguous_cells(self):
+        cells = {(1, 1): 1, (1, 2): 2, (2, 1): 3, (2, 2): 4, (1, 4): 5, (3, 1): 6}
+        self.assertEqual(group_contiguous_cells(cells), [
+            (1, 1, [[1, 2], [3, 4]]),
+            (1, 4, [[5]]),
+            (3, 1, [[6]]),
+        ])
+
+
 class TestCollectColumnOutputs(unittest.TestCase):
     def test_basic_scan(self):
         cells = {